@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark for the Workik AI Test Case Generator API
+
+Runs the FastAPI app in-process against a mock GitHub API (synthetic or
+recorded responses, with configurable latency) and the stub LLM provider, and
+reports throughput and p50/p95/p99 latency per endpoint and concurrency level
+as JSON, so results can be compared between releases.
+
+    python benchmark.py --files 2000 --concurrency 1 4 16 --output bench.json
+"""
+
+import argparse
+import asyncio
+import gzip
+import hashlib
+import io
+import json
+import math
+import os
+import platform
+import sys
+import tarfile
+import tempfile
+import time
+from typing import Dict, List
+
+OWNER = "bench"
+REPO = "repo"
+REPO_URL = f"https://github.com/{OWNER}/{REPO}"
+
+
+def blob_sha(text: str) -> str:
+    data = text.encode("utf-8")
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+def synthetic_fixture(file_count: int, file_bytes: int, language: str = "JavaScript") -> dict:
+    """Generate a repository fixture: source files spread over nested directories"""
+    files = {}
+    for i in range(file_count):
+        path = f"src/module{i % 20}/part{i % 7}/file{i}.js"
+        body = f"export function handler{i}(value) {{\n  return value + {i};\n}}\n"
+        files[path] = (body * (file_bytes // len(body) + 1))[:file_bytes]
+    return {"language": language, "files": files}
+
+
+def load_fixture(path: str) -> dict:
+    """Load a recorded fixture: {"language": ..., "files": {path: content}}"""
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class MockGitHub:
+    """Answers the GitHub REST and GraphQL requests the backend makes from a fixture"""
+
+    def __init__(self, fixture: dict, latency: float = 0.0, truncated: bool = False):
+        self.latency = latency
+        self.truncated = truncated
+        self.language = fixture.get("language", "JavaScript")
+        self.files: Dict[str, str] = fixture["files"]
+        self.blobs = {blob_sha(content): content for content in self.files.values()}
+        self.shas = {path: blob_sha(content) for path, content in self.files.items()}
+        self.commit_sha = hashlib.sha1(json.dumps(self.shas, sort_keys=True).encode("utf-8")).hexdigest()
+        self.tree_sha = hashlib.sha1(self.commit_sha.encode("utf-8")).hexdigest()
+        self.tree = self._build_tree()
+        self._tarball = None
+        self.requests = 0
+
+    def _build_tree(self) -> List[dict]:
+        directories = set()
+        for path in self.files:
+            parts = path.split("/")[:-1]
+            for i in range(1, len(parts) + 1):
+                directories.add("/".join(parts[:i]))
+        tree = [
+            {"path": d, "mode": "040000", "type": "tree", "sha": hashlib.sha1(d.encode("utf-8")).hexdigest()}
+            for d in sorted(directories)
+        ]
+        tree += [
+            {"path": path, "mode": "100644", "type": "blob", "sha": self.shas[path], "size": len(content.encode("utf-8"))}
+            for path, content in sorted(self.files.items())
+        ]
+        return tree
+
+    def tarball(self) -> bytes:
+        """The repository as GitHub serves it from /tarball: gzipped, under one top-level directory"""
+        if self._tarball is None:
+            buffer = io.BytesIO()
+            with tarfile.open(fileobj=buffer, mode="w") as archive:
+                for path, content in sorted(self.files.items()):
+                    data = content.encode("utf-8")
+                    info = tarfile.TarInfo(f"{OWNER}-{REPO}-{self.commit_sha[:7]}/{path}")
+                    info.size = len(data)
+                    archive.addfile(info, io.BytesIO(data))
+            self._tarball = gzip.compress(buffer.getvalue())
+        return self._tarball
+
+    async def handle(self, request):
+        import httpx
+
+        self.requests += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        path = request.url.path
+        prefix = f"/repos/{OWNER}/{REPO}"
+        if path == "/graphql":
+            return httpx.Response(200, json=self._graphql(json.loads(request.content)))
+        if path == prefix:
+            return httpx.Response(200, json={"full_name": f"{OWNER}/{REPO}", "language": self.language})
+        if path == f"{prefix}/languages":
+            return httpx.Response(200, json={self.language: sum(len(c) for c in self.files.values())})
+        if path.startswith(f"{prefix}/git/commits/"):
+            return httpx.Response(200, json={"sha": self.commit_sha, "tree": {"sha": self.tree_sha}})
+        if path.startswith(f"{prefix}/commits/"):
+            return httpx.Response(200, text=self.commit_sha)
+        if path.startswith(f"{prefix}/git/trees/"):
+            if self.truncated and request.url.params.get("recursive"):
+                return httpx.Response(200, json={"sha": self.tree_sha, "tree": self.tree[:100], "truncated": True})
+            return httpx.Response(200, json={"sha": self.tree_sha, "tree": self.tree, "truncated": False})
+        if path.startswith(f"{prefix}/tarball/"):
+            return httpx.Response(200, content=self.tarball(), headers={"Content-Type": "application/x-gzip"})
+        if path.startswith(f"{prefix}/git/blobs/"):
+            content = self.blobs.get(path.rsplit("/", 1)[1])
+            if content is not None:
+                return httpx.Response(200, text=content)
+        if path.startswith(f"{prefix}/contents/"):
+            content = self.files.get(path[len(f"{prefix}/contents/"):])
+            if content is not None:
+                return httpx.Response(200, text=content)
+        return httpx.Response(404, json={"message": "Not Found"})
+
+    def _graphql(self, payload: dict) -> dict:
+        repository = {}
+        for name, value in payload["variables"].items():
+            if not name.startswith("v"):
+                continue
+            content = self.blobs.get(value)
+            if content is None and ":" in value:
+                content = self.files.get(value.split(":", 1)[1])
+            repository[f"f{name[1:]}"] = None if content is None else {
+                "oid": blob_sha(content), "text": content, "isBinary": False, "isTruncated": False
+            }
+        return {"data": {"repository": repository}}
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, math.ceil(pct / 100 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+async def run_level(client, method: str, url: str, make_body, total: int, concurrency: int) -> dict:
+    """Send `total` requests with `concurrency` in flight and summarize their latencies"""
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+    counter = iter(range(total))
+
+    async def worker():
+        for i in counter:
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, url, json=make_body(i))
+                status = response.status_code
+            except Exception as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - start)
+            if status != 200:
+                errors[str(status)] = errors.get(str(status), 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": errors,
+        "seconds": round(elapsed, 4),
+        "throughput_rps": round(total / elapsed, 2) if elapsed else None,
+        "latency_ms": {
+            "mean": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0.0,
+            "p50": round(percentile(latencies, 50) * 1000, 3),
+            "p95": round(percentile(latencies, 95) * 1000, 3),
+            "p99": round(percentile(latencies, 99) * 1000, 3),
+            "max": round(latencies[-1] * 1000, 3) if latencies else 0.0,
+        },
+    }
+
+
+async def run_benchmark(args) -> dict:
+    # The app reads its configuration at import time, so set it up before importing main
+    os.environ["LLM_PROVIDER"] = "stub"
+    os.environ["STUB_LLM_LATENCY"] = str(args.llm_latency)
+    os.environ["LLM_CONCURRENCY"] = str(args.llm_concurrency)
+    os.environ["GITHUB_TOKEN"] = "benchmark-token"
+    os.environ.setdefault("JOB_DB_PATH", os.path.join(tempfile.mkdtemp(prefix="bench-"), "jobs.db"))
+    os.environ.setdefault("JOB_WORKERS", "0")
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import httpx
+    import main
+
+    fixture = load_fixture(args.fixture) if args.fixture else synthetic_fixture(args.files, args.file_bytes)
+    github = MockGitHub(fixture, latency=args.github_latency, truncated=args.truncated_tree)
+    selected = sorted(github.files)[:args.selected_files]
+    cache_mode = None if args.cache else "bypass"
+
+    scenarios = {
+        "files": ("POST", "/api/repo/files", lambda i: {"repoUrl": REPO_URL}),
+        "summaries": ("POST", "/api/generate/summaries", lambda i: {
+            "repoUrl": REPO_URL, "filePaths": selected, "fileShas": {p: github.shas[p] for p in selected},
+            "framework": "jest", "cache": cache_mode,
+        }),
+        "code": ("POST", "/api/generate/code", lambda i: {
+            "repoUrl": REPO_URL, "filePaths": selected, "fileShas": {p: github.shas[p] for p in selected},
+            "framework": "jest", "summary": f"Benchmark test case {i}", "cache": cache_mode,
+        }),
+    }
+
+    results = {}
+    async with main.lifespan(main.app):
+        # Route the app's pooled GitHub client to the mock server
+        await main.http_client.aclose()
+        main.http_client = httpx.AsyncClient(transport=httpx.MockTransport(github.handle))
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+            for name in args.endpoints:
+                method, url, make_body = scenarios[name]
+                # Warm-up request so the repo index and blob cache are populated, as in steady state
+                await client.request(method, url, json=make_body(-1))
+                results[name] = [
+                    await run_level(client, method, url, make_body, args.requests, concurrency)
+                    for concurrency in args.concurrency
+                ]
+
+    return {
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "config": {
+            "files": len(github.files),
+            "file_bytes": args.file_bytes,
+            "fixture": args.fixture,
+            "selected_files": len(selected),
+            "github_latency": args.github_latency,
+            "llm_latency": args.llm_latency,
+            "llm_concurrency": args.llm_concurrency,
+            "truncated_tree": args.truncated_tree,
+            "tarball_min_files": int(os.environ.get("TARBALL_MIN_FILES", "200")),
+            "response_cache": args.cache,
+            "requests": args.requests,
+        },
+        "github_requests": github.requests,
+        "results": results,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the API offline against a mock GitHub and stub LLM")
+    parser.add_argument("--fixture", help="Recorded fixture JSON ({\"language\", \"files\": {path: content}})")
+    parser.add_argument("--files", type=int, default=500, help="Number of files in the synthetic repository")
+    parser.add_argument("--file-bytes", type=int, default=2048, help="Size of each synthetic file")
+    parser.add_argument("--selected-files", type=int, default=10, help="Files sent to the generate endpoints")
+    parser.add_argument("--github-latency", type=float, default=0.02, help="Seconds per mock GitHub response")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Seconds per stub LLM call")
+    parser.add_argument("--llm-concurrency", type=int, default=4, help="LLM_CONCURRENCY for the app")
+    parser.add_argument("--requests", type=int, default=50, help="Requests per endpoint and concurrency level")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--endpoints", nargs="+", choices=["files", "summaries", "code"],
+                        default=["files", "summaries", "code"])
+    parser.add_argument("--cache", action="store_true", help="Let the LLM response cache serve repeated prompts")
+    parser.add_argument("--truncated-tree", action="store_true",
+                        help="Truncate the recursive tree listing, as GitHub does for very large repositories")
+    parser.add_argument("--output", help="Write results to this file instead of stdout")
+    return parser.parse_args(argv)
+
+
+def main():
+    args = parse_args()
+    report = asyncio.run(run_benchmark(args))
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+        print(f"Benchmark results written to {args.output}")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,549 @@
+"""
+Caches used by the Workik AI Test Case Generator backend
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+# Git objects addressed by SHA (trees, commits, blobs) never change, so they never need revalidating
+IMMUTABLE_URL = re.compile(r"/git/(?:trees|commits|blobs)/[0-9a-f]{40}$")
+
+# How long a cache write waits for another process's write lock. The caches are called on the
+# event loop, so a busy database skips the write (it is only a cache) rather than stalling requests.
+SQLITE_BUSY_TIMEOUT = 0.25
+
+
+def connect_sqlite(path: str) -> sqlite3.Connection:
+    """Open a WAL-mode SQLite database that several worker processes can read and write concurrently.
+
+    In WAL mode reads never wait for writers, and the caches below never write
+    on a read, so only writes can hit the (short) busy timeout.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(path, check_same_thread=False, timeout=SQLITE_BUSY_TIMEOUT)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class BlobCache:
+    """Content-addressed cache for git blobs, keyed by blob SHA.
+
+    Blobs are immutable, so entries never go stale. Recently used blobs are
+    kept in an in-memory LRU bounded by total bytes; when a directory is
+    configured, every blob is also written to a sharded on-disk tier
+    (`<dir>/<sha[:2]>/<sha[2:]>`) that survives restarts.
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024, directory: Optional[str] = None):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self._entries = OrderedDict()
+        self._size = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _disk_path(self, sha: str) -> str:
+        return os.path.join(self.directory, sha[:2], sha[2:])
+
+    def get(self, sha: str) -> Optional[str]:
+        """Return cached blob text, or None on a miss"""
+        if sha in self._entries:
+            self._entries.move_to_end(sha)
+            self.hits += 1
+            return self._entries[sha][0]
+
+        if self.directory:
+            try:
+                with open(self._disk_path(sha), "r", encoding="utf-8") as f:
+                    text = f.read()
+            except (OSError, UnicodeDecodeError):
+                pass
+            else:
+                self.disk_hits += 1
+                self._remember(sha, text)
+                return text
+
+        self.misses += 1
+        return None
+
+    def put(self, sha: str, text: str) -> None:
+        """Store blob text in memory and, if enabled, on disk"""
+        if self.directory:
+            path = self._disk_path(sha)
+            if not os.path.exists(path):
+                try:
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    tmp_path = f"{path}.{os.getpid()}.tmp"
+                    with open(tmp_path, "w", encoding="utf-8") as f:
+                        f.write(text)
+                    os.replace(tmp_path, path)
+                except OSError as e:
+                    print(f"Error writing blob {sha} to disk cache: {e}")
+        self._remember(sha, text)
+
+    def _remember(self, sha: str, text: str) -> None:
+        size = len(text.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        if sha in self._entries:
+            self._entries.move_to_end(sha)
+            return
+        self._entries[sha] = (text, size)
+        self._size += size
+        while self._size > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self._size -= evicted_size
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        """Return hit/miss/eviction counters and current memory usage"""
+        return {
+            "entries": len(self._entries),
+            "bytes": self._size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "disk_enabled": bool(self.directory),
+        }
+
+
+class ConditionalCache:
+    """Stores HTTP validators (ETag/Last-Modified) and bodies for conditional requests.
+
+    Entries are keyed by (token, URL, params) so users never see each other's
+    responses; tokens are hashed before being used in keys. The cache holds at
+    most `max_entries` responses and `max_bytes` of response bodies (recursive
+    trees can be several MB each), evicting the least recently used first.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def is_cacheable(url: str) -> bool:
+        """Whether a URL's responses are worth revalidating (SHA-addressed git objects are not)"""
+        return IMMUTABLE_URL.search(url.split("?", 1)[0]) is None
+
+    @staticmethod
+    def make_key(token: str, url: str, params: Optional[dict] = None) -> str:
+        token_hash = hashlib.sha256(token.encode("utf-8")).hexdigest()
+        encoded_params = json.dumps(params or {}, sort_keys=True, default=str)
+        return f"{token_hash}|{url}|{encoded_params}"
+
+    def get(self, key: str) -> Optional[Tuple[Optional[str], Optional[str], Any]]:
+        """Return (etag, last_modified, body) for a key, or None"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        return entry[:3]
+
+    def validators(self, key: str) -> dict:
+        """Return conditional request headers for a cached response"""
+        entry = self.get(key)
+        if entry is None:
+            return {}
+        etag, last_modified, _ = entry
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        return headers
+
+    def not_modified(self, key: str) -> Any:
+        """Record a 304 and return the cached body, or None if the entry has been evicted since"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[2]
+
+    def put(self, key: str, etag: Optional[str], last_modified: Optional[str], body: Any,
+            size: Optional[int] = None) -> None:
+        """Store a 200 response; responses without validators are not cacheable.
+
+        `size` is the response body's length in bytes (measured from the
+        re-encoded body when not given).
+        """
+        self.misses += 1
+        if not etag and not last_modified:
+            return
+        if size is None:
+            size = len(json.dumps(body))
+        if size > self.max_bytes:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._size -= previous[3]
+        self._entries[key] = (etag, last_modified, body, size)
+        self._size += size
+        while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= evicted[3]
+            self.evictions += 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        """Return 304 hit/miss/eviction counters"""
+        return {
+            "entries": len(self),
+            "max_entries": self.max_entries,
+            "bytes": self._size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class SQLiteConditionalCache(ConditionalCache):
+    """ConditionalCache stored in SQLite, so every worker process revalidates against the same entries.
+
+    Access times of 304 hits are kept in memory and written with the next put,
+    which is also the only time entries are evicted.
+    """
+
+    def __init__(self, path: str, max_entries: int = 1024):
+        super().__init__(max_entries)
+        self._lock = threading.Lock()
+        self._touched: Dict[str, float] = {}
+        self._conn = connect_sqlite(path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS conditional_responses ("
+            "key TEXT PRIMARY KEY, etag TEXT, last_modified TEXT, body TEXT NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS conditional_responses_accessed_at ON conditional_responses (accessed_at)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Tuple[Optional[str], Optional[str], Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag, last_modified, body FROM conditional_responses WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return row[0], row[1], json.loads(row[2])
+
+    def validators(self, key: str) -> dict:
+        # Only the validators are needed here, so skip decoding the body
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag, last_modified FROM conditional_responses WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return {}
+        headers = {}
+        if row[0]:
+            headers["If-None-Match"] = row[0]
+        if row[1]:
+            headers["If-Modified-Since"] = row[1]
+        return headers
+
+    def not_modified(self, key: str) -> Any:
+        entry = self.get(key)
+        if entry is None:
+            return None
+        self.hits += 1
+        with self._lock:
+            self._touched[key] = time.time()
+        return entry[2]
+
+    def put(self, key: str, etag: Optional[str], last_modified: Optional[str], body: Any,
+            size: Optional[int] = None) -> None:
+        self.misses += 1
+        if not etag and not last_modified:
+            return
+        with self._lock:
+            try:
+                self._conn.executemany(
+                    "UPDATE conditional_responses SET accessed_at = ? WHERE key = ?",
+                    [(accessed_at, touched_key) for touched_key, accessed_at in self._touched.items()]
+                )
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO conditional_responses (key, etag, last_modified, body, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (key, etag, last_modified, json.dumps(body), time.time())
+                )
+                (count,) = self._conn.execute("SELECT COUNT(*) FROM conditional_responses").fetchone()
+                evicted = max(0, count - self.max_entries)
+                if evicted:
+                    self._conn.execute(
+                        "DELETE FROM conditional_responses WHERE key IN "
+                        "(SELECT key FROM conditional_responses ORDER BY accessed_at LIMIT ?)",
+                        (evicted,)
+                    )
+                self._conn.commit()
+            except sqlite3.OperationalError as e:
+                self._conn.rollback()
+                print(f"Skipped HTTP cache write: {e}")
+                return
+            self._touched.clear()
+        self.evictions += evicted
+
+    def __len__(self) -> int:
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM conditional_responses").fetchone()
+        return count
+
+
+def create_http_cache(backend: str, max_entries: int, path: Optional[str] = None,
+                      max_bytes: int = 64 * 1024 * 1024) -> ConditionalCache:
+    """Create a ConditionalCache with a "memory" or "sqlite" backend (max_bytes bounds the memory backend)"""
+    if backend == "memory":
+        return ConditionalCache(max_entries=max_entries, max_bytes=max_bytes)
+    if backend == "sqlite":
+        return SQLiteConditionalCache(path or ".cache/http.db", max_entries=max_entries)
+    raise ValueError(f"Unknown HTTP cache backend: {backend}")
+
+
+class MemoryResponseBackend:
+    """In-process LRU storage for ResponseCache"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._tags: Dict[str, set] = {}
+
+    def get(self, key: str) -> Optional[Tuple[str, float]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        return entry[0], entry[1]
+
+    def set(self, key: str, value: str, created_at: float, tags: Iterable[str] = (), expired_before: float = 0) -> int:
+        """Store a value, dropping entries created before `expired_before`, and return the number evicted"""
+        self.delete(key)
+        for expired_key in [k for k, entry in self._entries.items() if entry[1] < expired_before]:
+            self.delete(expired_key)
+        tags = tuple(tags)
+        self._entries[key] = (value, created_at, tags)
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+        evicted = 0
+        while len(self._entries) > self.max_entries:
+            self.delete(next(iter(self._entries)))
+            evicted += 1
+        return evicted
+
+    def delete(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def delete_tagged(self, tags: Iterable[str]) -> int:
+        """Delete every entry carrying one of the tags and return how many were removed"""
+        keys = set()
+        for tag in tags:
+            keys.update(self._tags.get(tag, ()))
+        for key in keys:
+            self.delete(key)
+        return len(keys)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteResponseBackend:
+    """SQLite storage for ResponseCache that survives restarts; LRU by last access time.
+
+    Reads do not write: access times are kept in memory and written with the
+    next set, which is also the only time entries are evicted. Writes that find
+    the database busy are skipped.
+    """
+
+    def __init__(self, path: str, max_entries: int):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._touched: Dict[str, float] = {}
+        self._conn = connect_sqlite(path)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS response_tags (tag TEXT NOT NULL, key TEXT NOT NULL, PRIMARY KEY (tag, key))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS response_tags_key ON response_tags (key)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Tuple[str, float]]:
+        with self._lock:
+            row = self._conn.execute("SELECT value, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                self._touched[key] = time.time()
+        return row
+
+    def _write(self, description: str, statements) -> bool:
+        """Run statements(conn) in one transaction with the lock held; False if the database was busy"""
+        try:
+            statements(self._conn)
+            self._conn.commit()
+        except sqlite3.OperationalError as e:
+            self._conn.rollback()
+            print(f"Skipped response cache {description}: {e}")
+            return False
+        return True
+
+    def set(self, key: str, value: str, created_at: float, tags: Iterable[str] = (), expired_before: float = 0) -> int:
+        """Store a value, dropping entries created before `expired_before`, and return the number evicted"""
+        tags = tuple(tags)
+        evicted = 0
+
+        def statements(conn: sqlite3.Connection) -> None:
+            nonlocal evicted
+            # Access times recorded by reads since the last write
+            conn.executemany(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?",
+                [(accessed_at, touched_key) for touched_key, accessed_at in self._touched.items()]
+            )
+            expired = conn.execute("DELETE FROM responses WHERE created_at < ?", (expired_before,)).rowcount
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, created_at, created_at)
+            )
+            conn.executemany(
+                "INSERT OR IGNORE INTO response_tags (tag, key) VALUES (?, ?)", [(tag, key) for tag in tags]
+            )
+            (count,) = conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+            evicted = max(0, count - self.max_entries)
+            if evicted:
+                conn.execute(
+                    "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY accessed_at LIMIT ?)",
+                    (evicted,)
+                )
+            if evicted or expired:
+                conn.execute("DELETE FROM response_tags WHERE key NOT IN (SELECT key FROM responses)")
+
+        with self._lock:
+            if not self._write("write", statements):
+                return 0
+            self._touched.clear()
+        return evicted
+
+    def delete(self, key: str) -> None:
+        def statements(conn: sqlite3.Connection) -> None:
+            conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            conn.execute("DELETE FROM response_tags WHERE key = ?", (key,))
+
+        with self._lock:
+            self._touched.pop(key, None)
+            self._write("delete", statements)
+
+    def delete_tagged(self, tags: Iterable[str]) -> int:
+        """Delete every entry carrying one of the tags and return how many were removed"""
+        tags = list(tags)
+        if not tags:
+            return 0
+        placeholders = ", ".join("?" for _ in tags)
+        with self._lock:
+            keys = [row[0] for row in self._conn.execute(
+                f"SELECT DISTINCT key FROM response_tags WHERE tag IN ({placeholders})", tags
+            )]
+
+            def statements(conn: sqlite3.Connection) -> None:
+                conn.executemany("DELETE FROM responses WHERE key = ?", [(key,) for key in keys])
+                conn.executemany("DELETE FROM response_tags WHERE key = ?", [(key,) for key in keys])
+
+            if not self._write("invalidation", statements):
+                return 0
+        return len(keys)
+
+    def __len__(self) -> int:
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()
+        return count
+
+
+class ResponseCache:
+    """Memoizes LLM responses by a hash of the model ID and final prompt, with a TTL"""
+
+    def __init__(self, backend, ttl: float = 24 * 60 * 60):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(model_id: str, prompt: str, prompt_version: str = "") -> str:
+        return hashlib.sha256(f"{model_id}\0{prompt_version}\0{prompt}".encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return a cached response, or None if missing or expired (expired entries are dropped by set)"""
+        entry = self.backend.get(key)
+        if entry is not None:
+            value, created_at = entry
+            if time.time() - created_at <= self.ttl:
+                self.hits += 1
+                return value
+        self.misses += 1
+        return None
+
+    def set(self, key: str, value: str, tags: Iterable[str] = ()) -> None:
+        """Store a response; tags (e.g. source blob SHAs) allow targeted invalidation later"""
+        now = time.time()
+        self.evictions += self.backend.set(key, value, now, tags, expired_before=now - self.ttl)
+
+    def invalidate_tags(self, tags: Iterable[str]) -> int:
+        """Drop every response tagged with one of the tags"""
+        removed = self.backend.delete_tagged(tags)
+        self.invalidations += removed
+        return removed
+
+    def stats(self) -> dict:
+        """Return hit/miss/eviction counters"""
+        return {
+            "backend": type(self.backend).__name__,
+            "entries": len(self.backend),
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+def create_response_cache(backend: str, max_entries: int, ttl: float, path: Optional[str] = None) -> ResponseCache:
+    """Create a ResponseCache with a "memory" or "sqlite" backend"""
+    if backend == "memory":
+        return ResponseCache(MemoryResponseBackend(max_entries), ttl=ttl)
+    if backend == "sqlite":
+        return ResponseCache(SQLiteResponseBackend(path or ".cache/responses.db", max_entries), ttl=ttl)
+    raise ValueError(f"Unknown response cache backend: {backend}")
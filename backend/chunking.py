@@ -0,0 +1,140 @@
+"""
+Token-budgeted chunking of source files for map-reduce summarization
+"""
+
+import ast
+import re
+from typing import Callable, Dict, List, Set, Tuple
+
+# Lines that usually start a top-level declaration in the non-Python languages we list
+DECLARATION_PATTERN = re.compile(
+    r"^(?:export\s+)?(?:default\s+)?(?:async\s+)?"
+    r"(?:function|class|interface|enum|def|const\s+\w+\s*=\s*(?:async\s*)?\(|"
+    r"(?:public|private|protected|internal|static)\b)"
+)
+# The header format_file writes, with split_file's part suffix
+FILE_HEADER = re.compile(r"^// File: (.+?)(?: \(part \d+/\d+\))?$", re.MULTILINE)
+
+
+def format_file(path: str, content: str) -> str:
+    """Render a file the way it appears in prompts"""
+    return f"// File: {path}\n{content}\n\n"
+
+
+def _python_boundaries(content: str) -> List[int]:
+    """Line indexes where top-level Python statements start"""
+    tree = ast.parse(content)
+    boundaries = []
+    for node in tree.body:
+        line = node.lineno - 1
+        # Keep decorators with the function/class they decorate
+        for decorator in getattr(node, "decorator_list", []):
+            line = min(line, decorator.lineno - 1)
+        boundaries.append(line)
+    return boundaries
+
+
+def _declaration_boundaries(lines: List[str]) -> List[int]:
+    """Line indexes of unindented declarations in brace-style languages"""
+    return [i for i, line in enumerate(lines) if line and not line[0].isspace() and DECLARATION_PATTERN.match(line)]
+
+
+def split_file(path: str, content: str, max_tokens: int, count_tokens: Callable[[str], int]) -> List[str]:
+    """Split an oversized file into segments at function/class boundaries, each under max_tokens"""
+    lines = content.splitlines(keepends=True)
+    try:
+        boundaries = _python_boundaries(content) if path.endswith(".py") else _declaration_boundaries(lines)
+    except SyntaxError:
+        boundaries = _declaration_boundaries(lines)
+    boundaries = sorted(set([0] + boundaries))
+    units = ["".join(lines[start:end]) for start, end in zip(boundaries, boundaries[1:] + [len(lines)])]
+
+    # Pack declarations into segments; declarations that are still too big are split by lines.
+    # Token counts are summed per piece so packing stays linear in file size.
+    segments = []
+    current, current_tokens = "", 0
+    for unit in units:
+        pieces = [unit]
+        if count_tokens(unit) > max_tokens:
+            pieces = []
+            piece, piece_tokens = "", 0
+            for line in unit.splitlines(keepends=True):
+                line_tokens = count_tokens(line)
+                if piece and piece_tokens + line_tokens > max_tokens:
+                    pieces.append(piece)
+                    piece, piece_tokens = "", 0
+                piece += line
+                piece_tokens += line_tokens
+            if piece:
+                pieces.append(piece)
+        for piece in pieces:
+            piece_tokens = count_tokens(piece)
+            if current and current_tokens + piece_tokens > max_tokens:
+                segments.append(current)
+                current, current_tokens = "", 0
+            current += piece
+            current_tokens += piece_tokens
+    if current:
+        segments.append(current)
+
+    return [
+        format_file(f"{path} (part {i + 1}/{len(segments)})", segment)
+        for i, segment in enumerate(segments)
+    ]
+
+
+def chunk_files(files: List[Tuple[str, str]], max_tokens: int, count_tokens: Callable[[str], int]) -> List[str]:
+    """Pack files into prompt chunks of at most max_tokens, keeping file order.
+
+    Files that fit are grouped together; files larger than the budget are
+    split at function/class boundaries into their own chunks.
+    """
+    chunks = []
+    current, current_tokens = "", 0
+    for path, content in files:
+        rendered = format_file(path, content)
+        rendered_tokens = count_tokens(rendered)
+        if rendered_tokens > max_tokens:
+            if current:
+                chunks.append(current)
+                current, current_tokens = "", 0
+            chunks.extend(split_file(path, content, max_tokens, count_tokens))
+            continue
+        if current and current_tokens + rendered_tokens > max_tokens:
+            chunks.append(current)
+            current, current_tokens = "", 0
+        current += rendered
+        current_tokens += rendered_tokens
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _normalize(summary: str) -> str:
+    return " ".join(re.sub(r"[^\w\s]", " ", summary.lower()).split())
+
+
+def merge_summaries(summary_lists: List[list]) -> list:
+    """Reduce step: concatenate per-chunk summaries, dropping exact duplicates (ignoring case/punctuation)"""
+    seen = set()
+    merged = []
+    for summaries in summary_lists:
+        for summary in summaries:
+            key = _normalize(str(summary))
+            if key and key not in seen:
+                seen.add(key)
+                merged.append(summary)
+    return merged
+
+
+def summary_sources(chunks: List[str], summary_lists: List[list]) -> Dict[str, Set[str]]:
+    """Map each summary to the paths of the files in the chunks that produced it (or an exact duplicate)"""
+    by_key: Dict[str, Set[str]] = {}
+    for chunk, summaries in zip(chunks, summary_lists):
+        paths = set(FILE_HEADER.findall(chunk))
+        for summary in summaries:
+            by_key.setdefault(_normalize(str(summary)), set()).update(paths)
+    return {
+        str(summary): by_key.get(_normalize(str(summary)), set())
+        for summaries in summary_lists for summary in summaries
+    }
@@ -0,0 +1,369 @@
+"""
+Symbol-aware context extraction that shrinks source files before they are sent to the LLM
+"""
+
+import ast
+import re
+from collections import OrderedDict
+from typing import Callable, List, Optional, Set, Tuple, Union
+
+from chunking import DECLARATION_PATTERN
+from repo_index import git_blob_sha
+
+try:
+    from tree_sitter_languages import get_parser
+except ImportError:
+    get_parser = None
+
+# tree-sitter grammar per extension (.vue has no grammar and uses the regex fallback)
+TREE_SITTER_LANGUAGES = {
+    ".js": "javascript", ".jsx": "javascript", ".ts": "typescript", ".tsx": "tsx",
+    ".java": "java", ".c": "c", ".cpp": "cpp", ".cs": "c_sharp", ".php": "php",
+}
+
+# Nodes that become symbols, and nodes whose children are searched for more symbols
+DEFINITION_NODES = {
+    "function_declaration", "generator_function_declaration", "function_definition", "class_declaration",
+    "abstract_class_declaration", "interface_declaration", "enum_declaration", "method_definition",
+    "method_declaration", "constructor_declaration", "struct_declaration", "class_specifier", "struct_specifier",
+}
+CONTAINER_NODES = {
+    "program", "translation_unit", "export_statement", "namespace_definition", "namespace_declaration",
+    "declaration_list", "file_scoped_namespace_declaration", "compilation_unit",
+}
+CLASS_NODES = {
+    "class_declaration", "abstract_class_declaration", "interface_declaration", "enum_declaration",
+    "struct_declaration", "class_specifier", "struct_specifier",
+}
+VARIABLE_NODES = {"lexical_declaration", "variable_declaration"}
+FUNCTION_VALUES = {"arrow_function", "function", "function_expression", "generator_function"}
+
+# Line comment prefixes; "#" starts preprocessor directives in C-like languages, so it only counts for some
+COMMENT_PREFIXES = ("//", "/*", "*", "*/")
+HASH_COMMENT_LANGUAGES = {"python", "php"}
+WORD_PATTERN = re.compile(r"[A-Z]?[a-z0-9]+|[A-Z]+(?![a-z])")
+STOPWORDS = {
+    "the", "and", "for", "that", "this", "with", "when", "should", "test", "tests", "verify", "verifies",
+    "check", "checks", "ensure", "ensures", "return", "returns", "correctly", "properly", "given", "from",
+}
+
+
+def words(text: str) -> Set[str]:
+    """Lowercase words of the identifiers and prose in a text, with camelCase and snake_case split"""
+    return {
+        word.lower() for word in WORD_PATTERN.findall(text)
+        if len(word) > 2 and word.lower() not in STOPWORDS
+    }
+
+
+class Symbol:
+    """A function, method or class: its line range, the header kept in outlines, and nested symbols.
+
+    `parts` interleaves nested symbols with line ranges of other code in the
+    body (fields, constants), in source order.
+    """
+
+    __slots__ = ("name", "start", "end", "head", "elided", "closer", "parts", "name_words", "words")
+
+    def __init__(self, name: str, start: int, end: int, head: str, elided: str, closer: str = ""):
+        self.name = name
+        self.start = start
+        self.end = end
+        self.head = head
+        self.elided = elided
+        self.closer = closer
+        self.parts: List[Union["Symbol", Tuple[int, int]]] = []
+        self.name_words: Set[str] = set()
+        self.words: Set[str] = set()
+
+    def leaves(self) -> List["Symbol"]:
+        children = [part for part in self.parts if isinstance(part, Symbol)]
+        if not children:
+            return [self]
+        return [leaf for child in children for leaf in child.leaves()]
+
+
+class SymbolIndex:
+    """Top-level code ranges and symbols of one file version"""
+
+    def __init__(self, language: str, parts: List[Union[Symbol, Tuple[int, int]]]):
+        self.language = language
+        self.parts = parts
+
+    def leaves(self) -> List[Symbol]:
+        return [leaf for part in self.parts if isinstance(part, Symbol) for leaf in part.leaves()]
+
+
+def _is_code(line: str, prefixes: tuple = COMMENT_PREFIXES) -> bool:
+    stripped = line.strip()
+    return bool(stripped) and not stripped.startswith(prefixes)
+
+
+def _code_ranges(lines: List[str], start: int, end: int, prefixes: tuple) -> List[Tuple[int, int]]:
+    """Ranges of non-blank, non-comment lines in [start, end)"""
+    ranges = []
+    i = start
+    while i < end:
+        if _is_code(lines[i], prefixes):
+            j = i
+            while j < end and _is_code(lines[j], prefixes):
+                j += 1
+            ranges.append((i, j))
+            i = j
+        else:
+            i += 1
+    return ranges
+
+
+def _interleave(lines: List[str], start: int, end: int, symbols: List[Symbol],
+                language: str = "") -> List[Union[Symbol, Tuple[int, int]]]:
+    """Merge symbols with the code between them (comments dropped), in source order"""
+    prefixes = COMMENT_PREFIXES + ("#",) if language in HASH_COMMENT_LANGUAGES else COMMENT_PREFIXES
+    parts: List[Union[Symbol, Tuple[int, int]]] = []
+    position = start
+    for symbol in sorted(symbols, key=lambda s: s.start):
+        parts.extend(_code_ranges(lines, position, symbol.start, prefixes))
+        parts.append(symbol)
+        position = max(position, symbol.end)
+    parts.extend(_code_ranges(lines, position, end, prefixes))
+    return parts
+
+
+def _indent(line: str) -> str:
+    return line[:len(line) - len(line.lstrip())]
+
+
+def _finish(symbol: Symbol, lines: List[str]) -> Symbol:
+    body = "".join(lines[symbol.start:symbol.end])
+    symbol.name_words = words(symbol.name)
+    symbol.words = words(body)
+    return symbol
+
+
+def _python_symbols(lines: List[str], nodes: list) -> List[Symbol]:
+    symbols = []
+    for node in nodes:
+        if not isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            continue
+        start = min([node.lineno] + [d.lineno for d in node.decorator_list]) - 1
+        end = node.end_lineno
+        first = node.body[0]
+        body_start = first.lineno - 1
+        if body_start <= node.lineno - 1:
+            # One-line definition: nothing to elide
+            symbols.append(_finish(Symbol(node.name, start, end, "".join(lines[start:end]), ""), lines))
+            continue
+
+        has_docstring = (isinstance(first, ast.Expr) and isinstance(first.value, ast.Constant)
+                         and isinstance(first.value.value, str))
+        head_end = first.end_lineno if has_docstring else body_start
+        head = "".join(lines[start:head_end])
+        symbol = Symbol(node.name, start, end, head, f"{_indent(lines[body_start])}...\n")
+        if isinstance(node, ast.ClassDef):
+            children = _python_symbols(lines, node.body)
+            if children:
+                symbol.parts = _interleave(lines, head_end, end, children, "python")
+        symbols.append(_finish(symbol, lines))
+    return symbols
+
+
+def _node_name(node, source: bytes) -> str:
+    name = node.child_by_field_name("name")
+    if name is None:
+        # C/C++ functions keep the name inside the declarator
+        declarator = node.child_by_field_name("declarator")
+        while declarator is not None and declarator.child_by_field_name("declarator") is not None:
+            declarator = declarator.child_by_field_name("declarator")
+        name = declarator
+    if name is None:
+        return source[node.start_byte:node.end_byte].split(b"\n", 1)[0].decode("utf-8", "replace")
+    return source[name.start_byte:name.end_byte].decode("utf-8", "replace")
+
+
+def _tree_sitter_symbols(lines: List[str], node, source: bytes, language: str) -> List[Symbol]:
+    symbols = []
+    for child in node.named_children:
+        if child.type in CONTAINER_NODES:
+            symbols.extend(_tree_sitter_symbols(lines, child, source, language))
+            continue
+
+        definition, name_node = child, child
+        if child.type in VARIABLE_NODES:
+            # const handler = () => { ... }
+            declarator = next((c for c in child.named_children if c.type == "variable_declarator"), None)
+            value = declarator.child_by_field_name("value") if declarator is not None else None
+            if value is None or value.type not in FUNCTION_VALUES:
+                continue
+            definition, name_node = value, declarator
+        elif child.type not in DEFINITION_NODES:
+            continue
+
+        start, end = child.start_point[0], child.end_point[0] + 1
+        body = definition.child_by_field_name("body")
+        name = _node_name(name_node, source)
+        if body is None or body.start_point[0] >= body.end_point[0]:
+            symbols.append(_finish(Symbol(name, start, end, "".join(lines[start:end]), ""), lines))
+            continue
+
+        body_start = body.start_point[0]
+        head = "".join(lines[start:body_start + 1])
+        has_closer = lines[end - 1].strip().startswith("}")
+        closer = lines[end - 1] if has_closer else ""
+        indent = _indent(lines[start])
+        symbol = Symbol(name, start, end, head, f"{indent}    // ...\n{closer}", closer)
+        # Methods are indexed separately; functions nested in function bodies stay part of their parent
+        children = _tree_sitter_symbols(lines, body, source, language) if child.type in CLASS_NODES else []
+        if children:
+            symbol.parts = _interleave(lines, body_start + 1, end - 1 if has_closer else end, children, language)
+        symbols.append(_finish(symbol, lines))
+    return symbols
+
+
+def _regex_symbols(lines: List[str]) -> List[Symbol]:
+    """Fallback without a parser: unindented declarations, each running to the next one"""
+    starts = [i for i, line in enumerate(lines) if line and not line[0].isspace() and DECLARATION_PATTERN.match(line)]
+    symbols = []
+    for start, end in zip(starts, starts[1:] + [len(lines)]):
+        while end > start + 1 and not _is_code(lines[end - 1]):
+            end -= 1
+        header_end = next((i for i in range(start, min(end, start + 5)) if "{" in lines[i]), None)
+        if header_end is None or header_end >= end - 1:
+            symbols.append(_finish(Symbol(lines[start].strip(), start, end, "".join(lines[start:end]), ""), lines))
+            continue
+        closer = lines[end - 1] if lines[end - 1].strip().startswith("}") else ""
+        head = "".join(lines[start:header_end + 1])
+        symbols.append(_finish(Symbol(lines[start].strip(), start, end, head, f"    // ...\n{closer}", closer), lines))
+    return symbols
+
+
+def build_index(path: str, content: str) -> SymbolIndex:
+    """Parse a file into a symbol index: Python via ast, others via tree-sitter when installed, else regex"""
+    lines = content.splitlines(keepends=True)
+    extension = path[path.rfind("."):] if "." in path else ""
+    if extension == ".py":
+        try:
+            symbols = _python_symbols(lines, ast.parse(content).body)
+            return SymbolIndex("python", _interleave(lines, 0, len(lines), symbols, "python"))
+        except SyntaxError:
+            pass
+    elif get_parser is not None and extension in TREE_SITTER_LANGUAGES:
+        language = TREE_SITTER_LANGUAGES[extension]
+        source = content.encode("utf-8")
+        tree = get_parser(language).parse(source)
+        symbols = _tree_sitter_symbols(lines, tree.root_node, source, language)
+        return SymbolIndex(language, _interleave(lines, 0, len(lines), symbols, language))
+    return SymbolIndex("regex", _interleave(lines, 0, len(lines), _regex_symbols(lines)))
+
+
+def render(parts: List[Union[Symbol, Tuple[int, int]]], lines: List[str], expanded: Set[int],
+           hidden: Set[int] = frozenset()) -> str:
+    """Render code ranges and expanded symbols in full, hidden symbols not at all, and the rest as outlines"""
+    out = []
+    for part in parts:
+        if not isinstance(part, Symbol):
+            out.append("".join(lines[part[0]:part[1]]))
+        elif id(part) in hidden:
+            continue
+        elif id(part) in expanded:
+            out.append("".join(lines[part.start:part.end]))
+        elif any(isinstance(p, Symbol) for p in part.parts):
+            out.append(part.head + render(part.parts, lines, expanded, hidden) + part.closer)
+        else:
+            out.append(part.head + part.elided)
+    return "".join(out)
+
+
+def truncate(text: str, max_tokens: int, count_tokens: Callable[[str], int]) -> str:
+    """Cut text at a line boundary so it fits max_tokens"""
+    out, used = [], 0
+    for line in text.splitlines(keepends=True):
+        tokens = count_tokens(line)
+        if used + tokens > max_tokens:
+            out.append("// ... (truncated)\n")
+            break
+        out.append(line)
+        used += tokens
+    return "".join(out)
+
+
+class ContextExtractor:
+    """Builds symbol indexes (cached per blob SHA, so each file version is parsed once) and extracts prompt context.
+
+    Files are reduced to top-level code (imports, constants), signatures and
+    docstrings, plus the bodies of the symbols most relevant to a query, as
+    many as fit the token budget.
+    """
+
+    def __init__(self, max_entries: int = 2048):
+        self.max_entries = max_entries
+        self._indexes = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def index(self, path: str, content: str) -> SymbolIndex:
+        extension = path[path.rfind("."):] if "." in path else ""
+        key = f"{git_blob_sha(content)}:{extension}"
+        if key in self._indexes:
+            self._indexes.move_to_end(key)
+            self.hits += 1
+            return self._indexes[key]
+
+        self.misses += 1
+        index = build_index(path, content)
+        self._indexes[key] = index
+        while len(self._indexes) > self.max_entries:
+            self._indexes.popitem(last=False)
+            self.evictions += 1
+        return index
+
+    def extract(self, path: str, content: str, query: Optional[str], max_tokens: int,
+                count_tokens: Callable[[str], int]) -> str:
+        """Return the context for a file under max_tokens; without a query, files that fit are kept whole"""
+        if query is None and count_tokens(content) <= max_tokens:
+            return content
+
+        index = self.index(path, content)
+        lines = content.splitlines(keepends=True)
+        leaves = index.leaves()
+        candidates = leaves
+        relevant = []
+        if query:
+            query_words = words(query)
+            scores = {
+                id(leaf): 3 * len(leaf.name_words & query_words) + len(leaf.words & query_words)
+                for leaf in leaves
+            }
+            relevant = sorted((leaf for leaf in leaves if scores[id(leaf)]), key=lambda leaf: -scores[id(leaf)])
+            # Relevant bodies first, then whatever else fits in source order (e.g. helpers they call)
+            relevant_ids = {id(leaf) for leaf in relevant}
+            candidates = relevant + [leaf for leaf in leaves if id(leaf) not in relevant_ids]
+
+        expanded: Set[int] = set()
+        hidden: Set[int] = set()
+        used = count_tokens(render(index.parts, lines, expanded))
+        if used > max_tokens and relevant:
+            # Even the outline is over budget: drop the signatures of unrelated symbols
+            hidden = {id(leaf) for leaf in leaves if id(leaf) not in relevant_ids}
+            used = count_tokens(render(index.parts, lines, expanded, hidden))
+
+        for leaf in candidates:
+            if not leaf.elided or id(leaf) in hidden:
+                continue
+            cost = count_tokens("".join(lines[leaf.start:leaf.end])) - count_tokens(leaf.head + leaf.elided)
+            if used + cost <= max_tokens:
+                expanded.add(id(leaf))
+                used += cost
+
+        text = render(index.parts, lines, expanded, hidden)
+        return text if used <= max_tokens else truncate(text, max_tokens, count_tokens)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._indexes),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "tree_sitter": get_parser is not None,
+        }
@@ -0,0 +1,187 @@
+"""
+Near-duplicate detection for test case summaries: hashed TF-IDF vectors compared by cosine similarity
+"""
+
+import re
+import zlib
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from context import STOPWORDS, WORD_PATTERN
+
+# Hashed feature space: summaries are a sentence long, so collisions at this size are rare
+FEATURE_DIM = 1 << 11
+# Rows of the similarity matrix computed at once, bounding memory to BLOCK_ROWS x n floats
+BLOCK_ROWS = 512
+SUFFIXES = ("ing", "es", "ed", "s")
+
+# Values that contradict each other, mapped to a canonical value: summaries that differ only in
+# these ("... when disabled is true" / "... is false") are separate tests, however similar the wording
+CONTRASTS = {
+    "true": "true", "false": "false",
+    "null": "null", "undefined": "undefined", "none": "none", "nil": "nil",
+    "positive": "positive", "negative": "negative", "zero": "zero",
+    "enabled": "enabled", "disabled": "disabled",
+    "valid": "valid", "invalid": "invalid",
+    "visible": "visible", "hidden": "hidden",
+    "open": "open", "opened": "open", "closed": "closed",
+    "checked": "checked", "unchecked": "unchecked",
+    "authenticated": "authenticated", "unauthenticated": "unauthenticated",
+    "authorized": "authorized", "unauthorized": "unauthorized",
+    "success": "success", "succeeds": "success", "successful": "success", "successfully": "success",
+    "failure": "failure", "fails": "failure", "failed": "failure",
+    "min": "min", "minimum": "min", "max": "max", "maximum": "max",
+    "first": "first", "last": "last",
+    "ascending": "ascending", "descending": "descending",
+    "above": "above", "below": "below",
+    "before": "before", "after": "after",
+}
+NEGATIONS = {"not", "no", "never", "without", "cannot", "nor"}
+TOKEN_PATTERN = re.compile(r"[A-Za-z0-9_$']+")
+
+
+def signature(text: str) -> tuple:
+    """What two summaries must share to be merged: negation, contrasting values, and named subjects.
+
+    Subjects are identifiers (onClick, ValueError, user_id), capitalized names
+    after the first word (Button, Link) and numbers (404).
+    """
+    tokens = TOKEN_PATTERN.findall(text)
+    negated = any(token.lower() in NEGATIONS or token.lower().endswith("n't") for token in tokens)
+    values = frozenset(CONTRASTS[token.lower()] for token in tokens if token.lower() in CONTRASTS)
+    subjects = frozenset(
+        token for i, token in enumerate(tokens)
+        if (i > 0 and token[0].isupper()) or any(c.isupper() for c in token[1:])
+        or "_" in token or any(c.isdigit() for c in token)
+    )
+    return negated, values, subjects
+
+
+def _stem(word: str) -> str:
+    for suffix in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)]
+    return word
+
+
+def features(text: str) -> List[str]:
+    """Stemmed content words and word bigrams ("handles empty input" -> handl, empty, input, handl empty, ...)"""
+    words = [
+        _stem(word.lower()) for word in WORD_PATTERN.findall(text)
+        if len(word) > 2 and word.lower() not in STOPWORDS
+    ]
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+def vectorize(texts: Sequence[str], dim: int = FEATURE_DIM) -> np.ndarray:
+    """L2-normalized TF-IDF rows, with IDF taken over `texts` so words every summary shares count for little"""
+    rows, cols = [], []
+    for i, text in enumerate(texts):
+        # crc32 rather than hash(), which is salted per process
+        for column in {zlib.crc32(feature.encode("utf-8")) % dim for feature in features(text)}:
+            rows.append(i)
+            cols.append(column)
+
+    matrix = np.zeros((len(texts), dim), dtype=np.float32)
+    matrix[rows, cols] = 1.0
+    document_frequency = matrix.sum(axis=0)
+    matrix *= (np.log((1 + len(texts)) / (1 + document_frequency)) + 1).astype(np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+def earlier_neighbors(vectors: np.ndarray, threshold: float,
+                      groups: Optional[np.ndarray] = None) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """For each row, the earlier rows at least `threshold` similar to it, as (indices, similarities).
+
+    With `groups`, only rows in the same group are neighbors.
+    """
+    neighbors = []
+    for start in range(0, len(vectors), BLOCK_ROWS):
+        end = min(start + BLOCK_ROWS, len(vectors))
+        similarities = vectors[start:end] @ vectors[:end].T
+        # Keep only j < i
+        similarities[np.triu_indices(end - start, k=start, m=end)] = 0
+        if groups is not None:
+            similarities[groups[start:end, None] != groups[None, :end]] = 0
+        for row in similarities:
+            indices = np.flatnonzero(row >= threshold)
+            neighbors.append((indices, row[indices]))
+    return neighbors
+
+
+def cluster_summaries(summaries: List[str], threshold: float, history: Sequence[str] = ()) -> List[dict]:
+    """Group near-duplicate summaries, in order, each under the first summary of its cluster.
+
+    Previously returned summaries (`history`) go first, so a paraphrase of one
+    keeps its earlier wording. A summary joins the most similar canonical
+    summary at or above `threshold` with the same `signature` (members are not
+    compared with each other, so clusters do not chain). Only clusters with a member from `summaries` are
+    returned: {"canonical", "members" (the new summaries), "fromHistory"}.
+    """
+    texts = list(history) + [str(summary) for summary in summaries]
+    if not texts:
+        return []
+
+    signatures: Dict[tuple, int] = {}
+    groups = np.array([signatures.setdefault(signature(text), len(signatures)) for text in texts])
+    neighbors = earlier_neighbors(vectorize(texts), threshold, groups)
+    leader_of = np.arange(len(texts))
+    members: Dict[int, List[int]] = OrderedDict()
+    for i, (indices, similarities) in enumerate(neighbors):
+        is_leader = leader_of[indices] == indices
+        if is_leader.any():
+            leader_of[i] = indices[is_leader][np.argmax(similarities[is_leader])]
+        if i >= len(history):
+            members.setdefault(int(leader_of[i]), []).append(i)
+
+    return [
+        {
+            "canonical": texts[leader],
+            "members": [texts[i] for i in indices],
+            "fromHistory": leader < len(history),
+        }
+        for leader, indices in members.items()
+    ]
+
+
+class SummaryHistory:
+    """Canonical summaries previously returned per file, so repeated runs are deduplicated against them"""
+
+    def __init__(self, max_files: int = 4096, max_per_file: int = 100):
+        self.max_files = max_files
+        self.max_per_file = max_per_file
+        self._entries: "OrderedDict[tuple, List[str]]" = OrderedDict()
+
+    def get(self, keys: Iterable[tuple]) -> List[str]:
+        """Summaries recorded for any of the keys, oldest first, without repeats"""
+        seen = set()
+        summaries = []
+        for key in keys:
+            entry = self._entries.get(key)
+            if entry is None:
+                continue
+            self._entries.move_to_end(key)
+            for summary in entry:
+                if summary not in seen:
+                    seen.add(summary)
+                    summaries.append(summary)
+        return summaries
+
+    def add(self, keys: Iterable[tuple], summaries: List[str]) -> None:
+        for key in keys:
+            entry = self._entries.setdefault(key, [])
+            entry.extend(summary for summary in summaries if summary not in entry)
+            del entry[:-self.max_per_file]
+            self._entries.move_to_end(key)
+        while len(self._entries) > self.max_files:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {
+            "files": len(self._entries),
+            "max_files": self.max_files,
+            "summaries": sum(len(entry) for entry in self._entries.values()),
+        }
@@ -0,0 +1,368 @@
+"""
+Batch test generation jobs persisted in SQLite and run on an async worker pool
+"""
+
+import asyncio
+import hashlib
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+TERMINAL_STATUSES = {"completed", "failed"}
+
+# How long a write waits for another process's lock. Store calls run on the event loop, so a busy
+# database fails fast (sqlite3.OperationalError) and callers retry with retry_busy instead.
+BUSY_TIMEOUT_MS = 250
+
+
+def job_owner(token: str) -> str:
+    """Identify a job's submitter by a hash of their GitHub token (the token itself is never stored)"""
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def is_busy(error: Exception) -> bool:
+    return isinstance(error, sqlite3.OperationalError) and ("locked" in str(error) or "busy" in str(error))
+
+
+async def retry_busy(fn: Callable[..., Any], *args, attempts: int = 5, delay: float = 0.1, **kwargs) -> Any:
+    """Call a JobStore method, sleeping (without blocking the loop) and retrying while the database is busy"""
+    for attempt in range(attempts):
+        try:
+            return fn(*args, **kwargs)
+        except sqlite3.OperationalError as e:
+            if not is_busy(e) or attempt == attempts - 1:
+                raise
+        await asyncio.sleep(delay * (2 ** attempt))
+
+
+class JobStore:
+    """SQLite-backed job state that survives restarts.
+
+    File contents are resolved when a job is submitted and stored with the job,
+    so workers never need the submitter's GitHub token; they are deleted once
+    every item has finished. Jobs can only be read with the token that
+    submitted them (stored as a hash). Items are claimed inside
+    an IMMEDIATE transaction, which keeps claims atomic even when several
+    processes share the database. Idle polling only reads; write
+    transactions start once there is something to claim or requeue.
+    """
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                repo_url TEXT NOT NULL,
+                created_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS job_files (
+                job_id TEXT NOT NULL,
+                path TEXT NOT NULL,
+                content TEXT NOT NULL,
+                PRIMARY KEY (job_id, path)
+            );
+            CREATE TABLE IF NOT EXISTS job_items (
+                job_id TEXT NOT NULL,
+                idx INTEGER NOT NULL,
+                file_path TEXT NOT NULL,
+                summary TEXT NOT NULL,
+                framework TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                result TEXT,
+                error TEXT,
+                not_before REAL NOT NULL DEFAULT 0,
+                claimed_at REAL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (job_id, idx)
+            );
+            CREATE INDEX IF NOT EXISTS job_items_queue ON job_items (status, not_before);
+        """)
+        # Databases created before jobs had owners
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        if "owner" not in columns:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+
+    def _write(self, statements: List[tuple]) -> None:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for sql, params in statements:
+                    self._conn.execute(sql, params)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def create_job(self, repo_url: str, files: Dict[str, str], items: List[dict], failed_files: Dict[str, str],
+                   owner: str) -> str:
+        """Persist a job with its resolved files; items whose file could not be fetched fail immediately"""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        statements = [(
+            "INSERT INTO jobs (id, repo_url, created_at, owner) VALUES (?, ?, ?, ?)", (job_id, repo_url, now, owner)
+        )]
+        for path, content in files.items():
+            statements.append(("INSERT INTO job_files (job_id, path, content) VALUES (?, ?, ?)", (job_id, path, content)))
+        for idx, item in enumerate(items):
+            error = failed_files.get(item["file_path"])
+            statements.append((
+                "INSERT INTO job_items (job_id, idx, file_path, summary, framework, status, error, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, idx, item["file_path"], item["summary"], item["framework"],
+                 "failed" if error else "queued", error, now)
+            ))
+        statements.append(self._purge_finished_files(job_id))
+        self._write(statements)
+        return job_id
+
+    @staticmethod
+    def _purge_finished_files(job_id: str) -> tuple:
+        """Statement deleting a job's source files once none of its items can run again"""
+        return (
+            "DELETE FROM job_files WHERE job_id = ? AND NOT EXISTS "
+            "(SELECT 1 FROM job_items WHERE job_id = ? AND status NOT IN ('completed', 'failed'))",
+            (job_id, job_id)
+        )
+
+    def claim_item(self) -> Optional[dict]:
+        """Atomically mark the next due item as running and return it"""
+        now = time.time()
+        with self._lock:
+            # A plain read first, so idle workers never take the write lock
+            due = self._conn.execute(
+                "SELECT 1 FROM job_items WHERE status = 'queued' AND not_before <= ? LIMIT 1", (now,)
+            ).fetchone()
+            if due is None:
+                return None
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT job_id, idx, file_path, summary, framework, attempts FROM job_items "
+                    "WHERE status = 'queued' AND not_before <= ? ORDER BY not_before, job_id, idx LIMIT 1",
+                    (now,)
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE job_items SET status = 'running', attempts = attempts + 1, claimed_at = ?, updated_at = ? "
+                        "WHERE job_id = ? AND idx = ?",
+                        (now, now, row["job_id"], row["idx"])
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        item = dict(row)
+        item["attempts"] += 1
+        return item
+
+    def get_file(self, job_id: str, path: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content FROM job_files WHERE job_id = ? AND path = ?", (job_id, path)
+            ).fetchone()
+        return row["content"] if row else None
+
+    def complete_item(self, job_id: str, idx: int, result: str) -> None:
+        self._write([(
+            "UPDATE job_items SET status = 'completed', result = ?, error = NULL, updated_at = ? WHERE job_id = ? AND idx = ?",
+            (result, time.time(), job_id, idx)
+        ), self._purge_finished_files(job_id)])
+
+    def retry_item(self, job_id: str, idx: int, error: str, not_before: float) -> None:
+        self._write([(
+            "UPDATE job_items SET status = 'queued', error = ?, not_before = ?, updated_at = ? WHERE job_id = ? AND idx = ?",
+            (error, not_before, time.time(), job_id, idx)
+        )])
+
+    def fail_item(self, job_id: str, idx: int, error: str) -> None:
+        self._write([(
+            "UPDATE job_items SET status = 'failed', error = ?, updated_at = ? WHERE job_id = ? AND idx = ?",
+            (error, time.time(), job_id, idx)
+        ), self._purge_finished_files(job_id)])
+
+    def release_item(self, job_id: str, idx: int) -> None:
+        """Return an interrupted item to the queue without counting the attempt"""
+        self._write([(
+            "UPDATE job_items SET status = 'queued', attempts = attempts - 1, updated_at = ? WHERE job_id = ? AND idx = ?",
+            (time.time(), job_id, idx)
+        )])
+
+    def requeue_stale(self, lease_seconds: float) -> None:
+        """Requeue items left running by a worker that died"""
+        cutoff = time.time() - lease_seconds
+        with self._lock:
+            stale = self._conn.execute(
+                "SELECT 1 FROM job_items WHERE status = 'running' AND claimed_at < ? LIMIT 1", (cutoff,)
+            ).fetchone()
+        if stale is None:
+            return
+        self._write([(
+            "UPDATE job_items SET status = 'queued', updated_at = ? WHERE status = 'running' AND claimed_at < ?",
+            (time.time(), cutoff)
+        )])
+
+    def delete_expired(self, retention_seconds: float) -> int:
+        """Delete jobs created more than `retention_seconds` ago, with their items and files"""
+        cutoff = time.time() - retention_seconds
+        with self._lock:
+            job_ids = [row["id"] for row in self._conn.execute("SELECT id FROM jobs WHERE created_at < ?", (cutoff,))]
+        if job_ids:
+            statements = []
+            for table, column in (("job_files", "job_id"), ("job_items", "job_id"), ("jobs", "id")):
+                statements += [(f"DELETE FROM {table} WHERE {column} = ?", (job_id,)) for job_id in job_ids]
+            self._write(statements)
+        return len(job_ids)
+
+    def get_job(self, job_id: str, owner: Optional[str] = None) -> Optional[dict]:
+        """Return job progress and per-item results, or None if missing or (given an owner) not theirs"""
+        with self._lock:
+            job = self._conn.execute(
+                "SELECT id, repo_url, created_at, owner FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+            if job is None or (owner is not None and job["owner"] != owner):
+                return None
+            rows = self._conn.execute(
+                "SELECT idx, file_path, summary, framework, status, attempts, result, error "
+                "FROM job_items WHERE job_id = ? ORDER BY idx",
+                (job_id,)
+            ).fetchall()
+
+        items = [
+            {
+                "index": row["idx"],
+                "filePath": row["file_path"],
+                "summary": row["summary"],
+                "framework": row["framework"],
+                "status": row["status"],
+                "attempts": row["attempts"],
+                "code": row["result"],
+                "error": row["error"],
+            }
+            for row in rows
+        ]
+        counts = {status: 0 for status in ("queued", "running", "completed", "failed")}
+        for item in items:
+            counts[item["status"]] += 1
+
+        if counts["queued"] or counts["running"]:
+            status = "running" if counts["running"] or counts["completed"] or counts["failed"] else "queued"
+        else:
+            status = "failed" if counts["failed"] and not counts["completed"] else "completed"
+
+        return {
+            "id": job["id"],
+            "repoUrl": job["repo_url"],
+            "createdAt": job["created_at"],
+            "status": status,
+            "total": len(items),
+            **counts,
+            "items": items,
+        }
+
+
+class JobWorkerPool:
+    """Bounded pool of asyncio workers that process queued job items with retry and backoff"""
+
+    def __init__(self, store: JobStore, handler: Callable[[dict], Awaitable[str]], workers: int = 4,
+                 max_attempts: int = 3, retry_base_delay: float = 2.0, poll_interval: float = 1.0,
+                 lease_seconds: float = 600.0, retention_seconds: float = 0.0, purge_interval: float = 3600.0):
+        self.store = store
+        self.handler = handler
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_base_delay = retry_base_delay
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.retention_seconds = retention_seconds
+        self.purge_interval = purge_interval
+        self._next_purge = 0.0
+        self._wakeup = asyncio.Event()
+        self._tasks = []
+
+    def start(self) -> None:
+        self.store.requeue_stale(self.lease_seconds)
+        self._tasks = [asyncio.create_task(self._run()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def notify(self) -> None:
+        """Wake idle workers after new items are queued"""
+        self._wakeup.set()
+
+    def _purge_expired(self) -> None:
+        """Delete jobs past their retention period, at most once per purge_interval"""
+        if self.retention_seconds <= 0 or time.time() < self._next_purge:
+            return
+        self._next_purge = time.time() + self.purge_interval
+        removed = self.store.delete_expired(self.retention_seconds)
+        if removed:
+            print(f"Deleted {removed} batch jobs older than {self.retention_seconds:g}s")
+
+    def _backoff(self, attempts: int) -> float:
+        # Exponential backoff with jitter so retries from a burst don't line up
+        delay = self.retry_base_delay * (2 ** (attempts - 1))
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            try:
+                item = self.store.claim_item()
+            except sqlite3.OperationalError as e:
+                if not is_busy(e):
+                    raise
+                item = None  # Another process holds the write lock; poll again later
+            if item is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    try:
+                        self.store.requeue_stale(self.lease_seconds)
+                        self._purge_expired()
+                    except sqlite3.OperationalError as e:
+                        if not is_busy(e):
+                            raise
+                continue
+
+            try:
+                result = await self.handler(item)
+            except asyncio.CancelledError:
+                try:
+                    self.store.release_item(item["job_id"], item["idx"])
+                except sqlite3.OperationalError as e:
+                    # Left running; requeued once its lease expires
+                    print(f"Could not release job {item['job_id']} item {item['idx']}: {e}")
+                raise
+            except Exception as e:
+                error = str(getattr(e, "detail", e))
+                print(f"Error processing job {item['job_id']} item {item['idx']} (attempt {item['attempts']}): {error}")
+                if item["attempts"] >= self.max_attempts:
+                    outcome = (self.store.fail_item, item["job_id"], item["idx"], error)
+                else:
+                    not_before = time.time() + self._backoff(item["attempts"])
+                    outcome = (self.store.retry_item, item["job_id"], item["idx"], error, not_before)
+            else:
+                outcome = (self.store.complete_item, item["job_id"], item["idx"], result)
+            try:
+                await retry_busy(*outcome)
+            except sqlite3.OperationalError as e:
+                # Left running; requeued and run again once its lease expires
+                print(f"Could not record job {item['job_id']} item {item['idx']}: {e}")
@@ -1,21 +1,97 @@
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, Request, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import RedirectResponse
+from fastapi.responses import RedirectResponse, Response, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 import httpx
+import asyncio
 import os
 import json
+import math
+import time
 from dotenv import load_dotenv
-import base64
-import google.generativeai as genai
-import json as json_module
+from contextlib import asynccontextmanager
+from cache import BlobCache, create_http_cache, create_response_cache
+from llm import LLMProvider, create_provider
+from chunking import chunk_files, format_file, merge_summaries, summary_sources
+from jobs import JobStore, JobWorkerPool, TERMINAL_STATUSES, job_owner, retry_busy
+from rate_limit import GitHubRateLimiter, RateLimitExceeded
+from repo_index import RepoIndex, TreeStream, git_blob_sha, walk_tree
+from prompts import PromptRegistry
+from context import ContextExtractor
+from tarball import TarballStore
+from singleflight import SingleFlight
+from dedup import SummaryHistory, cluster_summaries
+from validation import CodeValidator
+from parsing import SUMMARIES_SCHEMA, parse_json_response, parse_stats, strip_code_fences
+from observability import (
+    CODE_VALIDATIONS, GITHUB_BYTES, GITHUB_LATENCY, GITHUB_REQUESTS, LLM_LATENCY, LLM_PROMPT_TOKENS, LLM_REQUESTS,
+    REQUEST_LATENCY,
+    StatsCollector, register_stats_collector, render_metrics, setup_tracing, span
+)
 
 # Load environment variables
 load_dotenv()
 
-app = FastAPI(title="Workik AI Test Case Generator API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create shared clients on startup and release them on shutdown"""
+    global http_client, job_pool
+    http_client = create_http_client()
+    job_pool = JobWorkerPool(
+        job_store,
+        process_job_item,
+        workers=JOB_WORKERS,
+        max_attempts=JOB_MAX_ATTEMPTS,
+        retry_base_delay=JOB_RETRY_BASE_DELAY,
+        lease_seconds=JOB_LEASE_SECONDS,
+        retention_seconds=JOB_RETENTION_SECONDS,
+    )
+    job_pool.start()
+    try:
+        yield
+    finally:
+        await job_pool.stop()
+        job_pool = None
+        code_validator.close()
+        await http_client.aclose()
+        http_client = None
+
+app = FastAPI(title="Workik AI Test Case Generator API", lifespan=lifespan)
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Record request latency by route template (not raw path, to keep label cardinality bounded).
+
+    Latency runs until the response body has been sent, so streamed responses
+    (SSE, NDJSON) are measured to their end rather than to their headers.
+    """
+    start = time.perf_counter()
+    
+    def observe(status_code: int) -> None:
+        route = request.scope.get("route")
+        REQUEST_LATENCY.labels(
+            request.method, getattr(route, "path", "unmatched"), str(status_code)
+        ).observe(time.perf_counter() - start)
+    
+    try:
+        with span("http.request", method=request.method, path=request.url.path):
+            response = await call_next(request)
+    except Exception:
+        observe(500)
+        raise
+    
+    body = response.body_iterator
+    async def observed_body():
+        try:
+            async for chunk in body:
+                yield chunk
+        finally:
+            observe(response.status_code)
+    
+    response.body_iterator = observed_body()
+    return response
 
 # CORS middleware
 app.add_middleware(
@@ -36,43 +112,311 @@ GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")  # Personal Access Token option
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 FRONTEND_URL = "http://localhost:5174"  # Updated to match current frontend port
 
-# Initialize Gemini
-if GEMINI_API_KEY:
-    genai.configure(api_key=GEMINI_API_KEY)
-    gemini_model = genai.GenerativeModel('gemini-1.5-flash')
-else:
-    gemini_model = None
+# HTTP connection pool settings for GitHub
+GITHUB_HTTP_TIMEOUT = float(os.getenv("GITHUB_HTTP_TIMEOUT", "30"))
+GITHUB_MAX_CONNECTIONS = int(os.getenv("GITHUB_MAX_CONNECTIONS", "100"))
+GITHUB_MAX_CONNECTIONS_PER_HOST = int(os.getenv("GITHUB_MAX_CONNECTIONS_PER_HOST", "20"))
+GITHUB_MAX_KEEPALIVE = int(os.getenv("GITHUB_MAX_KEEPALIVE", "20"))
+GITHUB_KEEPALIVE_EXPIRY = float(os.getenv("GITHUB_KEEPALIVE_EXPIRY", "60"))
+FILE_FETCH_CONCURRENCY = int(os.getenv("FILE_FETCH_CONCURRENCY", "8"))
+
+# Rate-limit pacing: below GITHUB_RATE_LIMIT_RESERVE remaining requests, calls are spread until reset
+GITHUB_RATE_LIMIT_RESERVE = int(os.getenv("GITHUB_RATE_LIMIT_RESERVE", "100"))
+GITHUB_RATE_LIMIT_MAX_WAIT = float(os.getenv("GITHUB_RATE_LIMIT_MAX_WAIT", "30"))
+GITHUB_MAX_RETRIES = int(os.getenv("GITHUB_MAX_RETRIES", "3"))
+REPO_INDEX_MAX_REPOS = int(os.getenv("REPO_INDEX_MAX_REPOS", "64"))
+
+# Source files offered for test generation (a tuple so str.endswith checks them in one call)
+RELEVANT_EXTENSIONS = ('.js', '.jsx', '.ts', '.tsx', '.vue', '.py', '.java', '.cpp', '.c', '.cs', '.php')
+GRAPHQL_BATCH_SIZE = int(os.getenv("GRAPHQL_BATCH_SIZE", "50"))
+
+# Tarball ingestion: selections of at least TARBALL_MIN_FILES files are read from one archive download (0 disables)
+TARBALL_MIN_FILES = int(os.getenv("TARBALL_MIN_FILES", "200"))
+TARBALL_DIR = os.getenv("TARBALL_DIR", ".cache/tarballs")
+TARBALL_MAX_ARCHIVES = int(os.getenv("TARBALL_MAX_ARCHIVES", "4"))
+
+# Blob cache settings (blobs are immutable, so they are cached by SHA)
+BLOB_CACHE_MAX_BYTES = int(os.getenv("BLOB_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+BLOB_CACHE_DIR = os.getenv("BLOB_CACHE_DIR")  # Enables the on-disk tier when set
+HTTP_CACHE_MAX_ENTRIES = int(os.getenv("HTTP_CACHE_MAX_ENTRIES", "2048"))
+HTTP_CACHE_MAX_BYTES = int(os.getenv("HTTP_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))  # Response bodies held in memory
+HTTP_CACHE_BACKEND = os.getenv("HTTP_CACHE_BACKEND", "memory")  # "sqlite" shares entries between worker processes
+HTTP_CACHE_PATH = os.getenv("HTTP_CACHE_PATH", ".cache/http.db")
+
+# LLM settings ("gemini", or "stub" for offline benchmarking)
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "gemini")
+LLM_MODEL = os.getenv("LLM_MODEL", "gemini-1.5-flash")
+LLM_FRAMEWORK_MODELS = json.loads(os.getenv("LLM_FRAMEWORK_MODELS", "{}"))  # e.g. {"pytest": "gemini-1.5-pro"}
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "4"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "120"))
+STUB_LLM_LATENCY = float(os.getenv("STUB_LLM_LATENCY", "0"))
+LLM_JSON_MODE = os.getenv("LLM_JSON_MODE", "true").lower() == "true"  # Request schema-constrained JSON for summaries
+PROMPTS_PATH = os.getenv("PROMPTS_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "prompts.json"))
+SUMMARY_CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", "24000"))  # Token budget per summary prompt
+
+# Near-duplicate summaries: cosine similarity at which paraphrases are merged (0 disables)
+SUMMARY_DEDUP_THRESHOLD = float(os.getenv("SUMMARY_DEDUP_THRESHOLD", "0.4"))
+SUMMARY_HISTORY_MAX_FILES = int(os.getenv("SUMMARY_HISTORY_MAX_FILES", "4096"))
+SUMMARY_HISTORY_PER_FILE = int(os.getenv("SUMMARY_HISTORY_PER_FILE", "100"))
+
+# Context extraction: code prompt files are reduced to signatures, docstrings and relevant bodies (0 disables)
+CODE_CONTEXT_TOKENS = int(os.getenv("CODE_CONTEXT_TOKENS", "8000"))  # Per code prompt, shared by its files
+SYMBOL_INDEX_MAX_ENTRIES = int(os.getenv("SYMBOL_INDEX_MAX_ENTRIES", "2048"))
+
+# Generated test validation: syntax-checked in a process pool, re-prompting with the error on failure (0 workers disables)
+VALIDATION_WORKERS = int(os.getenv("VALIDATION_WORKERS", "2"))
+VALIDATION_MAX_RETRIES = int(os.getenv("VALIDATION_MAX_RETRIES", "2"))
+VALIDATION_TIMEOUT = float(os.getenv("VALIDATION_TIMEOUT", "10"))  # Per checker command
+# Extra checkers, e.g. {"mocha": {"command": "node --check {file}", "suffix": ".js"}}
+VALIDATION_COMMANDS = json.loads(os.getenv("VALIDATION_COMMANDS", "{}"))
+
+# Tracing (optional): spans are exported over OTLP/HTTP when an endpoint is set and the SDK is installed
+OTEL_EXPORTER_OTLP_ENDPOINT = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT")  # e.g. http://localhost:4318/v1/traces
+OTEL_SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "test-case-generator-api")
+
+# Batch job settings
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", ".cache/jobs.db")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_RETRY_BASE_DELAY = float(os.getenv("JOB_RETRY_BASE_DELAY", "2"))
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "600"))  # Running items older than this are requeued
+JOB_EVENTS_INTERVAL = float(os.getenv("JOB_EVENTS_INTERVAL", "1"))
+JOB_RETENTION_SECONDS = float(os.getenv("JOB_RETENTION_SECONDS", str(7 * 24 * 60 * 60)))  # 0 keeps jobs forever
+
+# LLM response cache settings ("memory" or "sqlite")
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory")
+RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH", ".cache/responses.db")
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1000"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", str(24 * 60 * 60)))
+
+# Prompt templates and framework catalog
+prompt_registry = PromptRegistry.load(PROMPTS_PATH)
+
+# LLM providers, created on first use per model
+llm_providers: Dict[str, LLMProvider] = {}
+
+# Caps concurrent LLM calls across all requests
+llm_semaphore = asyncio.Semaphore(max(1, LLM_CONCURRENCY))
+
+# Content-addressed cache for file contents
+blob_cache = BlobCache(max_bytes=BLOB_CACHE_MAX_BYTES, directory=BLOB_CACHE_DIR)
+
+# Symbol indexes of source files, cached per blob SHA
+context_extractor = ContextExtractor(max_entries=SYMBOL_INDEX_MAX_ENTRIES)
+
+# ETag/Last-Modified cache for GitHub metadata (304s don't count against the rate limit)
+http_cache = create_http_cache(
+    HTTP_CACHE_BACKEND, HTTP_CACHE_MAX_ENTRIES, path=HTTP_CACHE_PATH, max_bytes=HTTP_CACHE_MAX_BYTES
+)
+
+# Memoized LLM responses keyed by model ID + prompt hash
+response_cache = create_response_cache(
+    RESPONSE_CACHE_BACKEND, RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_TTL, path=RESPONSE_CACHE_PATH
+)
+
+# Syntax checks for generated test files (worker processes start on first use)
+code_validator = CodeValidator(workers=VALIDATION_WORKERS, timeout=VALIDATION_TIMEOUT, commands=VALIDATION_COMMANDS)
+
+# Summaries previously returned per file, to deduplicate repeated runs against
+summary_history = SummaryHistory(max_files=SUMMARY_HISTORY_MAX_FILES, max_per_file=SUMMARY_HISTORY_PER_FILE)
+
+# Concurrent identical GitHub GETs and LLM prompts share one in-flight call
+github_flights = SingleFlight()
+llm_flights = SingleFlight()
+
+# Per-token GitHub rate-limit tracking
+rate_limiter = GitHubRateLimiter(
+    reserve=GITHUB_RATE_LIMIT_RESERVE, max_wait=GITHUB_RATE_LIMIT_MAX_WAIT, max_retries=GITHUB_MAX_RETRIES
+)
+
+# Batch job state (persisted) and worker pool (started in lifespan())
+job_store = JobStore(JOB_DB_PATH)
+job_pool: Optional[JobWorkerPool] = None
 
 # Pydantic models
 class RepoFilesRequest(BaseModel):
     repoUrl: str
+    ref: str = "HEAD"
+
+class RepoFilesPageRequest(BaseModel):
+    repoUrl: str
+    ref: str = "HEAD"
+    cursor: Optional[str] = None  # Path of the last file on the previous page
+    limit: int = 500
+    prefix: str = ""  # Only paths starting with this prefix
+    extensions: Optional[List[str]] = None  # Defaults to RELEVANT_EXTENSIONS
 
 class GenerateSummariesRequest(BaseModel):
     repoUrl: str
     filePaths: List[str]
     framework: str = "jest"  # Default to Jest
+    ref: str = "HEAD"
+    fileShas: Optional[Dict[str, str]] = None  # Blob SHAs from /api/repo/files, keyed by path
+    cache: Optional[str] = None  # "bypass" to skip cached responses
 
 class GenerateCodeRequest(BaseModel):
-    fileContents: str
     summary: str
     framework: str = "jest"  # Default to Jest
+    cache: Optional[str] = None  # "bypass" to skip cached responses
+    # Either send the source code directly...
+    fileContents: Optional[str] = None
+    # ...or let the server resolve it from the repository
+    repoUrl: Optional[str] = None
+    filePaths: List[str] = []
+    ref: str = "HEAD"
+    fileShas: Optional[Dict[str, str]] = None
 
-def parse_json_response(text: str) -> list:
-    """Parse the output of an LLM call to a JSON array."""
-    try:
-        # Try to parse as JSON directly
-        return json_module.loads(text.strip())
-    except json_module.JSONDecodeError:
-        # If that fails, try to extract JSON from the text
-        import re
-        json_match = re.search(r'\[.*\]', text, re.DOTALL)
-        if json_match:
-            try:
-                return json_module.loads(json_match.group())
-            except json_module.JSONDecodeError:
-                pass
-        # If all else fails, return a single-item list
-        return [text.strip()]
+class BatchJobItem(BaseModel):
+    filePath: str
+    summary: str
+    framework: Optional[str] = None  # Defaults to the job's framework
+
+class BatchJobRequest(BaseModel):
+    repoUrl: str
+    items: List[BatchJobItem]
+    framework: str = "jest"
+    ref: str = "HEAD"
+    fileShas: Optional[Dict[str, str]] = None
+
+# Shared HTTP client, created in lifespan() so connections are reused across requests
+http_client: Optional[httpx.AsyncClient] = None
+
+def create_http_client() -> httpx.AsyncClient:
+    """Build a pooled HTTP/2 client with per-host connection caps for GitHub"""
+    host_limits = httpx.Limits(
+        max_connections=GITHUB_MAX_CONNECTIONS_PER_HOST,
+        max_keepalive_connections=GITHUB_MAX_KEEPALIVE,
+        keepalive_expiry=GITHUB_KEEPALIVE_EXPIRY,
+    )
+    return httpx.AsyncClient(
+        http2=True,
+        timeout=httpx.Timeout(GITHUB_HTTP_TIMEOUT, connect=10.0),
+        limits=httpx.Limits(
+            max_connections=GITHUB_MAX_CONNECTIONS,
+            max_keepalive_connections=GITHUB_MAX_KEEPALIVE,
+            keepalive_expiry=GITHUB_KEEPALIVE_EXPIRY,
+        ),
+        mounts={
+            "https://api.github.com": httpx.AsyncHTTPTransport(http2=True, limits=host_limits),
+            "https://github.com": httpx.AsyncHTTPTransport(http2=True, limits=host_limits),
+        },
+    )
+
+def get_http_client() -> httpx.AsyncClient:
+    """Return the shared HTTP client, creating it if the app was started without lifespan"""
+    global http_client
+    if http_client is None:
+        http_client = create_http_client()
+    return http_client
+
+def get_llm(framework: Optional[str] = None) -> LLMProvider:
+    """Return the LLM provider for a framework, honoring per-framework model overrides"""
+    if LLM_PROVIDER == "gemini" and not GEMINI_API_KEY:
+        raise HTTPException(status_code=500, detail="Gemini API not configured")
+    
+    model = LLM_FRAMEWORK_MODELS.get(framework, LLM_MODEL)
+    if model not in llm_providers:
+        llm_providers[model] = create_provider(
+            LLM_PROVIDER, model, api_key=GEMINI_API_KEY, stub_latency=STUB_LLM_LATENCY
+        )
+    return llm_providers[model]
+
+async def generate_text(llm: LLMProvider, prompt: str, schema: Optional[dict] = None) -> str:
+    """Run a generation bounded by LLM_CONCURRENCY and LLM_TIMEOUT"""
+    LLM_PROMPT_TOKENS.labels(llm.model_id).inc(llm.count_tokens(prompt))
+    async with llm_semaphore:
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            with span("llm.generate", model=llm.model_id):
+                text = await asyncio.wait_for(llm.generate_async(prompt, schema), timeout=LLM_TIMEOUT)
+            outcome = "ok"
+            return text
+        except asyncio.TimeoutError:
+            outcome = "timeout"
+            raise HTTPException(status_code=504, detail="LLM request timed out")
+        finally:
+            LLM_LATENCY.labels(llm.model_id, "generate").observe(time.perf_counter() - start)
+            LLM_REQUESTS.labels(llm.model_id, "generate", outcome).inc()
+
+async def generate_cached(llm: LLMProvider, prompt: str, cache_mode: Optional[str] = None, tags: Tuple[str, ...] = (),
+                          schema: Optional[dict] = None) -> Tuple[str, bool]:
+    """Return (text, cached), serving repeated prompts from the response cache unless bypassed"""
+    cache_key = response_cache.make_key(llm.model_id, prompt, prompt_registry.version)
+    
+    async def generate() -> str:
+        text = await generate_text(llm, prompt, schema)
+        response_cache.set(cache_key, text, tags)
+        return text
+    
+    if cache_mode == "bypass":
+        # A bypass asks for a fresh generation, so it doesn't join one already running either
+        return await generate(), False
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        return cached, True
+    return await llm_flights.do(cache_key, generate), False
+
+async def validate_code(llm: LLMProvider, framework: str, prompt: str, code: str,
+                        cache_mode: Optional[str] = None) -> Tuple[str, dict]:
+    """Check generated test code, re-prompting with the error up to VALIDATION_MAX_RETRIES times.
+    
+    Returns the last code generated and its validation result, with the number
+    of attempts and the time spent checking (not generating).
+    """
+    attempts = 0
+    seconds = 0.0
+    while True:
+        attempts += 1
+        start = time.perf_counter()
+        with span("code.validate", framework=framework):
+            result = await code_validator.validate(code, framework)
+        seconds += time.perf_counter() - start
+        CODE_VALIDATIONS.labels(framework, result["status"]).inc()
+        if result["status"] != "failed" or attempts > VALIDATION_MAX_RETRIES:
+            break
+        code_validator.repairs += 1
+        text, _ = await generate_cached(llm, prompt_registry.render_repair(prompt, code, result["error"]), cache_mode)
+        code = strip_code_fences(text)
+    return code, {**result, "attempts": attempts, "seconds": round(seconds, 4)}
+
+async def stream_text(llm: LLMProvider, prompt: str) -> AsyncIterator[str]:
+    """Yield generated chunks as they arrive, bounded like generate_text"""
+    LLM_PROMPT_TOKENS.labels(llm.model_id).inc(llm.count_tokens(prompt))
+    async with llm_semaphore:
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        deadline = start + LLM_TIMEOUT
+        chunks = llm.stream_async(prompt).__aiter__()
+        first_chunk = True
+        # Stays "cancelled" if the consumer stops early (client disconnect)
+        outcome = "cancelled"
+        try:
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), timeout=max(0.0, deadline - loop.time()))
+                except StopAsyncIteration:
+                    outcome = "ok"
+                    return
+                except asyncio.TimeoutError:
+                    outcome = "timeout"
+                    raise HTTPException(status_code=504, detail="LLM request timed out")
+                if first_chunk:
+                    LLM_LATENCY.labels(llm.model_id, "stream_first_chunk").observe(loop.time() - start)
+                    first_chunk = False
+                yield chunk
+        except Exception:
+            if outcome == "cancelled":
+                outcome = "error"
+            raise
+        finally:
+            LLM_LATENCY.labels(llm.model_id, "stream").observe(loop.time() - start)
+            LLM_REQUESTS.labels(llm.model_id, "stream", outcome).inc()
+
+def format_sse(data: dict, event: Optional[str] = None) -> str:
+    """Encode a Server-Sent Events message"""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
 
 # Helper functions
 async def get_github_token(credentials: Optional[HTTPAuthorizationCredentials] = Depends(security)) -> str:
@@ -95,21 +439,456 @@ async def validate_github_token(token: str) -> dict:
     except Exception as e:
         raise HTTPException(status_code=401, detail=f"Invalid GitHub token: {str(e)}")
 
+def github_delay(token: str, resource: str) -> float:
+    """How long to wait before sending; fails fast with a 429 while the token's budget is exhausted"""
+    try:
+        return rate_limiter.delay_before_request(token, resource)
+    except RateLimitExceeded as e:
+        raise HTTPException(
+            status_code=429, detail=str(e), headers={"Retry-After": str(math.ceil(e.retry_after))}
+        )
+
+async def github_request(method: str, url: str, token: str, **kwargs) -> httpx.Response:
+    """Send a GitHub API request, pacing by the token's remaining budget and retrying rate-limited responses"""
+    resource = "graphql" if url.endswith("/graphql") else "core"
+    attempt = 0
+    while True:
+        delay = github_delay(token, resource)
+        if delay:
+            await asyncio.sleep(delay)
+        
+        start = time.perf_counter()
+        response = await get_http_client().request(method, url, **kwargs)
+        GITHUB_LATENCY.labels(resource).observe(time.perf_counter() - start)
+        GITHUB_REQUESTS.labels(resource, str(response.status_code)).inc()
+        GITHUB_BYTES.labels(resource).inc(len(response.content))
+        rate_limiter.update(token, response.headers, resource)
+        
+        # Only rate-limit responses need their body; decoding every multi-MB blob or tree would be wasted
+        body = response.text if response.status_code in (403, 429) else ""
+        retry_delay = rate_limiter.retry_delay(
+            token, response.status_code, response.headers, body, attempt, resource
+        )
+        if retry_delay is None:
+            return response
+        print(f"GitHub rate limit hit for {url}, retrying in {retry_delay:.1f}s")
+        attempt += 1
+
+@asynccontextmanager
+async def github_stream(method: str, url: str, token: str, **kwargs) -> AsyncIterator[httpx.Response]:
+    """Open a streamed GitHub API response, with the same pacing and rate-limit retries as github_request"""
+    resource = "core"
+    attempt = 0
+    while True:
+        delay = github_delay(token, resource)
+        if delay:
+            await asyncio.sleep(delay)
+        
+        start = time.perf_counter()
+        async with get_http_client().stream(method, url, **kwargs) as response:
+            GITHUB_LATENCY.labels(resource).observe(time.perf_counter() - start)
+            GITHUB_REQUESTS.labels(resource, str(response.status_code)).inc()
+            # Redirected downloads (e.g. tarballs from codeload) carry the budget on the API response
+            rate_headers = response.history[0].headers if response.history else response.headers
+            rate_limiter.update(token, rate_headers, resource)
+            
+            retry_delay = None
+            if response.status_code in (403, 429):
+                body = await response.aread()
+                GITHUB_BYTES.labels(resource).inc(len(body))
+                retry_delay = rate_limiter.retry_delay(
+                    token, response.status_code, rate_headers, body.decode("utf-8", "replace"), attempt, resource
+                )
+            if retry_delay is None:
+                yield response
+                return
+        print(f"GitHub rate limit hit for {url}, retrying in {retry_delay:.1f}s")
+        attempt += 1
+
 async def fetch_github_api(url: str, token: str, params: dict = None):
-    """Make authenticated request to GitHub API"""
+    """Make authenticated request to GitHub API, revalidating cached responses with ETags.
+    
+    Concurrent calls for the same URL, params and token share one request.
+    """
+    cache_key = http_cache.make_key(token, url, params)
+    return await github_flights.do(cache_key, lambda: _fetch_github_api(url, token, params, cache_key))
+
+async def _fetch_github_api(url: str, token: str, params: Optional[dict], cache_key: str):
+    cacheable = http_cache.is_cacheable(url)
     headers = {
         "Authorization": f"Bearer {token}",
         "Accept": "application/vnd.github.v3+json"
     }
+    validators = http_cache.validators(cache_key) if cacheable else {}
+    
+    with span("github.fetch_api"):
+        response = await github_request("GET", url, token, headers={**headers, **validators}, params=params)
+        if response.status_code == 304:
+            body = http_cache.not_modified(cache_key)
+            if body is not None:
+                return body
+            # The entry was evicted (here or by another worker) after its validators were sent
+            response = await github_request("GET", url, token, headers=headers, params=params)
+    if response.status_code != 200:
+        raise HTTPException(
+            status_code=response.status_code,
+            detail=f"GitHub API error: {response.text}"
+        )
+    body = response.json()
+    if cacheable:
+        http_cache.put(
+            cache_key, response.headers.get("ETag"), response.headers.get("Last-Modified"), body,
+            size=len(response.content)
+        )
+    return body
+
+async def fetch_github_raw(url: str, token: str, params: dict = None) -> bytes:
+    """Fetch raw bytes from the GitHub API (blobs and contents without base64/metadata)"""
+    headers = {
+        "Authorization": f"Bearer {token}",
+        "Accept": "application/vnd.github.raw"
+    }
+    
+    response = await github_request("GET", url, token, headers=headers, params=params)
+    if response.status_code != 200:
+        raise HTTPException(
+            status_code=response.status_code,
+            detail=f"GitHub API error: {response.text}"
+        )
+    return response.content
+
+async def post_github_graphql(query: str, variables: dict, token: str) -> dict:
+    """Run a GitHub GraphQL query and return its data payload"""
+    response = await github_request(
+        "POST",
+        "https://api.github.com/graphql",
+        token,
+        headers={"Authorization": f"Bearer {token}"},
+        json={"query": query, "variables": variables}
+    )
+    if response.status_code != 200:
+        raise HTTPException(
+            status_code=response.status_code,
+            detail=f"GitHub GraphQL error: {response.text}"
+        )
+    payload = response.json()
+    if payload.get("data") is None:
+        raise HTTPException(status_code=502, detail=f"GitHub GraphQL error: {payload.get('errors')}")
+    return payload["data"]
+
+async def fetch_commit_sha(owner: str, repo: str, ref: str, token: str) -> str:
+    """Resolve a ref to its commit SHA (the sha media type returns just the 40-character SHA)"""
+    url = f"https://api.github.com/repos/{owner}/{repo}/commits/{ref}"
+    flight_key = ("sha", http_cache.make_key(token, url))
+    return await github_flights.do(flight_key, lambda: _fetch_commit_sha(url, token))
+
+async def _fetch_commit_sha(url: str, token: str) -> str:
+    headers = {
+        "Authorization": f"Bearer {token}",
+        "Accept": "application/vnd.github.sha"
+    }
     
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url, headers=headers, params=params)
+    response = await github_request("GET", url, token, headers=headers)
+    if response.status_code != 200:
+        raise HTTPException(
+            status_code=response.status_code,
+            detail=f"GitHub API error: {response.text}"
+        )
+    return response.text.strip()
+
+@asynccontextmanager
+async def open_tree_stream(owner: str, repo: str, token: str, tree_ish: str) -> AsyncIterator[TreeStream]:
+    """Open a recursive tree listing whose entries are parsed off the wire as it downloads"""
+    url = f"https://api.github.com/repos/{owner}/{repo}/git/trees/{tree_ish}"
+    headers = {
+        "Authorization": f"Bearer {token}",
+        "Accept": "application/vnd.github.v3+json"
+    }
+    
+    async def counted(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        async for chunk in chunks:
+            GITHUB_BYTES.labels("core").inc(len(chunk))
+            yield chunk
+    
+    async with github_stream("GET", url, token, headers=headers, params={"recursive": 1}) as response:
+        if response.status_code != 200:
+            body = await response.aread()
+            raise HTTPException(
+                status_code=response.status_code,
+                detail=f"GitHub API error: {body.decode('utf-8', 'replace')}"
+            )
+        yield TreeStream(counted(response.aiter_bytes()))
+
+async def stream_github_tree(owner: str, repo: str, ref: str, token: str) -> AsyncIterator[dict]:
+    """Yield recursive tree entries as they are parsed off the wire, walking subtrees if GitHub truncates the listing"""
+    async with open_tree_stream(owner, repo, token, ref) as entries:
+        emitted = set()
+        async for entry in entries:
+            if entry.get("type") == "blob":
+                emitted.add(entry["path"])
+            yield entry
+    
+    if entries.truncated:
+        async for path, sha, size in walk_tree(fetch_github_api, owner, repo, token, ref):
+            if path not in emitted:
+                yield {"path": path, "type": "blob", "sha": sha, "size": size}
+
+async def stream_github_tarball(owner: str, repo: str, commit_sha: str, token: str) -> AsyncIterator[bytes]:
+    """Yield the gzipped repository archive for a commit (GitHub redirects to codeload, without our token)"""
+    url = f"https://api.github.com/repos/{owner}/{repo}/tarball/{commit_sha}"
+    headers = {"Authorization": f"Bearer {token}"}
+    
+    async with github_stream("GET", url, token, headers=headers, follow_redirects=True) as response:
         if response.status_code != 200:
+            body = await response.aread()
             raise HTTPException(
                 status_code=response.status_code,
-                detail=f"GitHub API error: {response.text}"
+                detail=f"GitHub API error: {body.decode('utf-8', 'replace')}"
             )
-        return response.json()
+        async for chunk in response.aiter_bytes():
+            GITHUB_BYTES.labels("core").inc(len(chunk))
+            yield chunk
+
+async def fetch_archive_listing(owner: str, repo: str, token: str, commit_sha: str) -> List[Tuple[str, str, Optional[int]]]:
+    """List every file of a commit from its archive, with locally computed blob SHAs"""
+    loop = asyncio.get_running_loop()
+    async with tarball_store.open(owner, repo, commit_sha, token) as archive:
+        return await loop.run_in_executor(None, archive.listing)
+
+async def read_from_archive(owner: str, repo: str, file_paths: List[str], token: str, ref: str) -> Tuple[Dict[str, str], Dict[str, str]]:
+    """Read files from the repository archive, returning ({path: text}, {path: error}).
+
+    Files the archive does not contain (e.g. submodule or LFS paths) are in neither, for the API to fetch.
+    """
+    # Resolving the ref with the caller's token also checks their access to the repository
+    commit_sha = await fetch_commit_sha(owner, repo, ref, token)
+    loop = asyncio.get_running_loop()
+    with span("github.read_archive", files=len(file_paths)):
+        async with tarball_store.open(owner, repo, commit_sha, token) as archive:
+            # Reading, decoding and hashing are blocking; keep them off the event loop
+            read, errors = await loop.run_in_executor(None, archive.read_texts, file_paths)
+    texts = {}
+    for file_path, (sha, text) in read.items():
+        texts[file_path] = text
+        blob_cache.put(sha, text)
+    return texts, errors
+
+async def fetch_blobs_graphql(owner: str, repo: str, paths: List[str], ref: str, shas: Dict[str, str], token: str) -> Dict[str, Optional[dict]]:
+    """Fetch a batch of blobs in a single GraphQL query, by SHA when known or by `ref:path` otherwise"""
+    declarations = ["$owner: String!", "$name: String!"]
+    fields = []
+    variables = {"owner": owner, "name": repo}
+    for i, path in enumerate(paths):
+        if shas.get(path):
+            declarations.append(f"$v{i}: GitObjectID!")
+            selector = f"object(oid: $v{i})"
+            variables[f"v{i}"] = shas[path]
+        else:
+            declarations.append(f"$v{i}: String!")
+            selector = f"object(expression: $v{i})"
+            variables[f"v{i}"] = f"{ref}:{path}"
+        fields.append(f"f{i}: {selector} {{ ... on Blob {{ oid text isBinary isTruncated }} }}")
+    
+    query = f"query({', '.join(declarations)}) {{ repository(owner: $owner, name: $name) {{ {' '.join(fields)} }} }}"
+    data = await post_github_graphql(query, variables, token)
+    repository = data.get("repository") or {}
+    return {path: repository.get(f"f{i}") for i, path in enumerate(paths)}
+
+async def verify_blob_shas(owner: str, repo: str, token: str, ref: str, shas: Dict[str, str]) -> Dict[str, str]:
+    """Keep only client-supplied blob SHAs that the repository index, refreshed with this token, agrees with.
+
+    The blob cache is shared by every user and repository, so an unchecked SHA
+    would serve cached content without GitHub ever checking the caller's access.
+    """
+    if not shas:
+        return {}
+    try:
+        snapshot = await refresh_repo_index(owner, repo, token, ref)
+    except Exception as e:
+        print(f"Could not verify file SHAs for {owner}/{repo}, fetching by path: {e}")
+        return {}
+    files = snapshot.files()
+    return {path: sha for path, sha in shas.items() if files.get(path, (None,))[0] == sha}
+
+async def fetch_file_contents(owner: str, repo: str, file_paths: List[str], token: str, ref: str = "HEAD", shas: Optional[Dict[str, str]] = None) -> Tuple[List[Tuple[str, str]], List[dict]]:
+    """Fetch file contents, batching through GraphQL with git/blobs as fallback, preserving input order"""
+    shas = await verify_blob_shas(owner, repo, token, ref, shas or {})
+    semaphore = asyncio.Semaphore(max(1, FILE_FETCH_CONCURRENCY))
+    
+    # Serve known blob SHAs from the cache first
+    cached = {}
+    for file_path in file_paths:
+        if shas.get(file_path):
+            text = blob_cache.get(shas[file_path])
+            if text is not None:
+                cached[file_path] = text
+    missing_paths = [path for path in file_paths if path not in cached]
+    
+    # Large selections: one archive download instead of a request per batch/file
+    archive_errors = {}
+    if TARBALL_MIN_FILES and len(missing_paths) >= TARBALL_MIN_FILES:
+        try:
+            archived, archive_errors = await read_from_archive(owner, repo, missing_paths, token, ref)
+        except Exception as e:
+            print(f"Error reading repository archive, falling back to the API: {e}")
+        else:
+            cached.update(archived)
+            # Anything the archive did not have goes through GraphQL/REST below
+            missing_paths = [path for path in missing_paths if path not in archived and path not in archive_errors]
+    
+    async def fetch_batch(batch: List[str]) -> Dict[str, Optional[dict]]:
+        async with semaphore:
+            try:
+                return await fetch_blobs_graphql(owner, repo, batch, ref, shas, token)
+            except Exception as e:
+                print(f"Error fetching blob batch via GraphQL, falling back to REST: {e}")
+                return {}
+    
+    batch_size = max(1, GRAPHQL_BATCH_SIZE)
+    batches = [missing_paths[i:i + batch_size] for i in range(0, len(missing_paths), batch_size)]
+    blobs = {}
+    with span("github.fetch_blob_batches", batches=len(batches)):
+        batch_results = await asyncio.gather(*(fetch_batch(batch) for batch in batches))
+    for batch_result in batch_results:
+        blobs.update(batch_result)
+    
+    async def fetch_one(file_path: str) -> str:
+        if file_path in cached:
+            return cached[file_path]
+        if file_path in archive_errors:
+            raise ValueError(archive_errors[file_path])
+        
+        blob = blobs.get(file_path) or {}
+        if blob.get("isBinary"):
+            raise ValueError("Binary file skipped")
+        if blob.get("text") is not None and not blob.get("isTruncated"):
+            blob_cache.put(blob["oid"], blob["text"])
+            return blob["text"]
+        
+        # Fall back to REST for truncated (large) blobs or failed batches
+        sha = blob.get("oid") or shas.get(file_path)
+        async with semaphore:
+            if sha:
+                data = await fetch_github_raw(f"https://api.github.com/repos/{owner}/{repo}/git/blobs/{sha}", token)
+            else:
+                data = await fetch_github_raw(
+                    f"https://api.github.com/repos/{owner}/{repo}/contents/{file_path}",
+                    token,
+                    params={"ref": ref}
+                )
+        text = data.decode("utf-8")
+        if sha:
+            blob_cache.put(sha, text)
+        return text
+    
+    with span("github.fetch_files", files=len(file_paths), cached=len(cached)):
+        results = await asyncio.gather(*(fetch_one(path) for path in file_paths), return_exceptions=True)
+    
+    files = []
+    failures = []
+    for file_path, result in zip(file_paths, results):
+        if isinstance(result, BaseException):
+            print(f"Error fetching file {file_path}: {result}")
+            error = result.detail if isinstance(result, HTTPException) else str(result)
+            failures.append({"path": file_path, "error": error})
+        else:
+            files.append((file_path, result))
+    return files, failures
+
+def build_code_prompt(framework: str, summary: str, file_contents: str) -> str:
+    """Build the framework-specific prompt for test code generation"""
+    with span("prompt.build", task="code", framework=framework):
+        return prompt_registry.render("code", framework, summary=summary, file_contents=file_contents)
+
+def build_summaries_prompt(framework: str, content: str) -> str:
+    """Build the framework-specific prompt for test case summaries"""
+    with span("prompt.build", task="summaries", framework=framework):
+        return prompt_registry.render("summaries", framework, content=content)
+
+# Per-repository file index, refreshed incrementally between commits (after the GitHub helpers it calls)
+repo_index = RepoIndex(
+    fetch_github_api, fetch_commit_sha, max_repos=REPO_INDEX_MAX_REPOS, concurrency=FILE_FETCH_CONCURRENCY,
+    fetch_archive_listing=fetch_archive_listing if TARBALL_MIN_FILES else None, open_tree_stream=open_tree_stream
+)
+
+# Downloaded repository archives, keyed by commit SHA
+tarball_store = TarballStore(stream_github_tarball, TARBALL_DIR, max_archives=TARBALL_MAX_ARCHIVES)
+
+async def refresh_repo_index(owner: str, repo: str, token: str, ref: str = "HEAD"):
+    """Update the repository index and drop cached summaries whose source blobs changed"""
+    snapshot, changed_blobs = await repo_index.refresh(owner, repo, token, ref)
+    if changed_blobs:
+        # Summaries built from blobs that changed can never be served again
+        removed = response_cache.invalidate_tags(set(changed_blobs.values()))
+        print(f"{len(changed_blobs)} files changed in {owner}/{repo}, dropped {removed} cached summaries")
+    return snapshot
+
+def extract_sources(files: List[Tuple[str, str]], query: Optional[str], file_tokens: int,
+                    count_tokens) -> List[Tuple[str, str]]:
+    """Reduce each file to the context relevant to a query, within file_tokens per file"""
+    if file_tokens <= 0:
+        return files
+    with span("context.extract", files=len(files)):
+        return [
+            (file_path, context_extractor.extract(file_path, content, query, file_tokens, count_tokens))
+            for file_path, content in files
+        ]
+
+async def resolve_code_sources(request: GenerateCodeRequest, token: str, llm: LLMProvider) -> Tuple[str, List[dict]]:
+    """Return the source code for a code generation request and any files that failed to load"""
+    if request.fileContents is not None:
+        return request.fileContents, []
+    if not request.repoUrl or not request.filePaths:
+        raise HTTPException(status_code=400, detail="Provide fileContents or repoUrl with filePaths")
+    
+    # Extract owner and repo from URL
+    repo_path = request.repoUrl.replace("https://github.com/", "")
+    owner, repo = repo_path.split("/")
+    
+    # Goes through the blob cache, so files fetched for summaries are not downloaded again
+    files, failed_files = await fetch_file_contents(
+        owner, repo, request.filePaths, token, ref=request.ref, shas=request.fileShas
+    )
+    if not files:
+        raise HTTPException(status_code=502, detail="Failed to fetch source files")
+    
+    # Only signatures and the bodies relevant to the test case objective are sent
+    # Shared by the files; at least one token each, since a budget of 0 would mean "send whole files"
+    file_tokens = max(1, CODE_CONTEXT_TOKENS // len(files)) if CODE_CONTEXT_TOKENS > 0 else 0
+    files = extract_sources(files, request.summary, file_tokens, llm.count_tokens)
+    return "".join(format_file(file_path, content) for file_path, content in files), failed_files
+
+async def process_job_item(item: dict) -> str:
+    """Generate test code for one batch job item"""
+    content = job_store.get_file(item["job_id"], item["file_path"])
+    llm = get_llm(item["framework"])
+    [(_, context)] = extract_sources(
+        [(item["file_path"], content)], item["summary"], CODE_CONTEXT_TOKENS, llm.count_tokens
+    )
+    prompt = build_code_prompt(item["framework"], item["summary"], format_file(item["file_path"], context))
+    code, _ = await generate_cached(llm, prompt)
+    code, _ = await validate_code(llm, item["framework"], prompt, strip_code_fences(code))
+    return code
+
+# Export the existing cache, rate-limit and parsing counters on /metrics
+register_stats_collector(StatsCollector(
+    caches={
+        "blobs": blob_cache.stats,
+        "http": http_cache.stats,
+        "responses": response_cache.stats,
+        "repo_index": repo_index.stats,
+        "symbols": context_extractor.stats,
+        "tarballs": tarball_store.stats,
+        "summary_history": summary_history.stats,
+        "github_inflight": github_flights.stats,
+        "llm_inflight": llm_flights.stats,
+    },
+    rate_limits=rate_limiter.stats,
+    parse_outcomes=parse_stats.as_dict,
+))
+
+if OTEL_EXPORTER_OTLP_ENDPOINT:
+    setup_tracing(OTEL_SERVICE_NAME, OTEL_EXPORTER_OTLP_ENDPOINT)
 
 # Routes
 
@@ -135,25 +914,24 @@ async def github_callback(code: str):
     
     try:
         # Exchange code for access token
-        async with httpx.AsyncClient() as client:
-            token_response = await client.post(
-                "https://github.com/login/oauth/access_token",
-                json={
-                    "client_id": GITHUB_CLIENT_ID,
-                    "client_secret": GITHUB_CLIENT_SECRET,
-                    "code": code
-                },
-                headers={"Accept": "application/json"}
-            )
-            
-            token_data = token_response.json()
-            access_token = token_data.get("access_token")
-            
-            if not access_token:
-                return RedirectResponse(url=f"{FRONTEND_URL}?error=no_token")
-            
-            # Redirect to frontend with token
-            return RedirectResponse(url=f"{FRONTEND_URL}/dashboard?token={access_token}")
+        token_response = await get_http_client().post(
+            "https://github.com/login/oauth/access_token",
+            json={
+                "client_id": GITHUB_CLIENT_ID,
+                "client_secret": GITHUB_CLIENT_SECRET,
+                "code": code
+            },
+            headers={"Accept": "application/json"}
+        )
+        
+        token_data = token_response.json()
+        access_token = token_data.get("access_token")
+        
+        if not access_token:
+            return RedirectResponse(url=f"{FRONTEND_URL}?error=no_token")
+        
+        # Redirect to frontend with token
+        return RedirectResponse(url=f"{FRONTEND_URL}/dashboard?token={access_token}")
             
     except Exception as e:
         print(f"Error exchanging code for token: {e}")
@@ -167,6 +945,43 @@ async def check_auth():
         "auth_method": "personal_token" if GITHUB_TOKEN else "oauth"
     }
 
+@app.get("/api/cache/stats")
+async def get_cache_stats():
+    """Report cache hit/miss/eviction counters"""
+    return {
+        "blobs": blob_cache.stats(),
+        "http": http_cache.stats(),
+        "responses": response_cache.stats(),
+        "repo_index": repo_index.stats(),
+        "symbols": context_extractor.stats(),
+        "tarballs": tarball_store.stats(),
+        "summaryHistory": summary_history.stats(),
+        "inflight": {
+            "github": github_flights.stats(),
+            "llm": llm_flights.stats()
+        }
+    }
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus metrics: request/GitHub/LLM latency, bytes fetched, prompt tokens and cache counters"""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+@app.get("/api/llm/stats")
+async def get_llm_stats():
+    """Report how LLM responses were parsed and generated code validated, including fallbacks and failures"""
+    return {
+        "jsonMode": LLM_JSON_MODE,
+        "parsing": parse_stats.as_dict(),
+        "validation": code_validator.stats()
+    }
+
+@app.get("/api/github/rate-limit")
+async def get_rate_limit_stats():
+    """Report the last known GitHub rate-limit budget per token"""
+    return rate_limiter.stats()
+
 @app.get("/api/user")
 async def get_user(token: str = Depends(get_github_token)):
     """Get authenticated user's profile"""
@@ -200,18 +1015,14 @@ async def get_repo_files(request: RepoFilesRequest, token: str = Depends(get_git
         repo_path = request.repoUrl.replace("https://github.com/", "")
         owner, repo = repo_path.split("/")
         
-        # Fetch repository tree
-        tree_data = await fetch_github_api(
-            f"https://api.github.com/repos/{owner}/{repo}/git/trees/HEAD",
-            token,
-            params={"recursive": 1}
-        )
+        # Bring the repository index up to date (only changed subtrees are fetched)
+        snapshot = await refresh_repo_index(owner, repo, token, request.ref)
         
         # Filter for relevant files
-        relevant_extensions = {'.js', '.jsx', '.ts', '.tsx', '.vue', '.py', '.java', '.cpp', '.c', '.cs', '.php'}
         relevant_files = [
-            item for item in tree_data.get("tree", [])
-            if item.get("type") == "blob" and any(item.get("path", "").endswith(ext) for ext in relevant_extensions)
+            {"path": path, "type": "blob", "sha": sha, "size": size}
+            for path, sha, size in snapshot.sorted_files()
+            if path.endswith(RELEVANT_EXTENSIONS)
         ]
         
         return relevant_files
@@ -219,6 +1030,55 @@ async def get_repo_files(request: RepoFilesRequest, token: str = Depends(get_git
     except Exception as e:
         raise HTTPException(status_code=500, detail="Failed to fetch repository files")
 
+@app.post("/api/repo/files/page")
+async def get_repo_files_page(request: RepoFilesPageRequest, token: str = Depends(get_github_token)):
+    """Get one cursor-paginated page of the repository file list, optionally filtered by path prefix and extension"""
+    try:
+        # Extract owner and repo from URL
+        repo_path = request.repoUrl.replace("https://github.com/", "")
+        owner, repo = repo_path.split("/")
+        
+        snapshot = await refresh_repo_index(owner, repo, token, request.ref)
+        suffixes = tuple(request.extensions) if request.extensions else RELEVANT_EXTENSIONS
+        files, next_cursor = snapshot.page(
+            request.cursor, max(1, min(request.limit, 5000)), prefix=request.prefix, suffixes=suffixes
+        )
+        
+        return {
+            "files": [{"path": path, "type": "blob", "sha": sha, "size": size} for path, sha, size in files],
+            "nextCursor": next_cursor,
+            "commit": snapshot.commit_sha
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error fetching repository file page: {e}")
+        raise HTTPException(status_code=500, detail="Failed to fetch repository files")
+
+@app.post("/api/repo/files/stream")
+async def stream_repo_files(request: RepoFilesPageRequest, token: str = Depends(get_github_token)):
+    """Stream the repository file list as NDJSON while the tree is still downloading"""
+    # Extract owner and repo from URL
+    repo_path = request.repoUrl.replace("https://github.com/", "")
+    owner, repo = repo_path.split("/")
+    suffixes = tuple(request.extensions) if request.extensions else RELEVANT_EXTENSIONS
+    
+    async def ndjson_stream():
+        try:
+            async for entry in stream_github_tree(owner, repo, request.ref, token):
+                path = entry.get("path", "")
+                if entry.get("type") == "blob" and path.startswith(request.prefix) and path.endswith(suffixes):
+                    file_info = {"path": path, "type": "blob", "sha": entry.get("sha"), "size": entry.get("size")}
+                    yield json.dumps(file_info) + "\n"
+        except HTTPException as e:
+            yield json.dumps({"error": e.detail}) + "\n"
+        except Exception as e:
+            print(f"Error streaming repository files: {e}")
+            yield json.dumps({"error": "Failed to fetch repository files"}) + "\n"
+    
+    return StreamingResponse(ndjson_stream(), media_type="application/x-ndjson")
+
 @app.post("/api/repo/frameworks")
 async def get_suggested_frameworks(request: RepoFilesRequest, token: str = Depends(get_github_token)):
     """Analyze repository and suggest appropriate testing frameworks"""
@@ -244,57 +1104,8 @@ async def get_suggested_frameworks(request: RepoFilesRequest, token: str = Depen
         if languages_data:
             primary_language = max(languages_data.keys(), key=lambda k: languages_data[k])
         
-        # Framework suggestions based on language and repository structure
-        frameworks = {
-            "JavaScript": [
-                {"id": "jest", "name": "Jest", "description": "Popular JavaScript testing framework"},
-                {"id": "mocha", "name": "Mocha", "description": "Feature-rich JavaScript test framework"},
-                {"id": "cypress", "name": "Cypress", "description": "End-to-end testing framework"},
-                {"id": "playwright", "name": "Playwright", "description": "Cross-browser automation library"}
-            ],
-            "TypeScript": [
-                {"id": "jest", "name": "Jest", "description": "Popular JavaScript/TypeScript testing framework"},
-                {"id": "vitest", "name": "Vitest", "description": "Fast unit test framework for Vite projects"},
-                {"id": "cypress", "name": "Cypress", "description": "End-to-end testing framework"},
-                {"id": "playwright", "name": "Playwright", "description": "Cross-browser automation library"}
-            ],
-            "Python": [
-                {"id": "pytest", "name": "pytest", "description": "Simple and scalable Python testing framework"},
-                {"id": "unittest", "name": "unittest", "description": "Built-in Python testing framework"},
-                {"id": "selenium", "name": "Selenium", "description": "Web application testing framework"},
-                {"id": "behave", "name": "Behave", "description": "Behavior-driven development framework"}
-            ],
-            "Java": [
-                {"id": "junit", "name": "JUnit", "description": "Standard testing framework for Java"},
-                {"id": "testng", "name": "TestNG", "description": "Testing framework inspired by JUnit"},
-                {"id": "selenium", "name": "Selenium", "description": "Web application testing framework"},
-                {"id": "mockito", "name": "Mockito", "description": "Mocking framework for unit tests"}
-            ],
-            "C#": [
-                {"id": "nunit", "name": "NUnit", "description": "Unit testing framework for .NET"},
-                {"id": "xunit", "name": "xUnit", "description": "Free, open-source testing tool for .NET"},
-                {"id": "mstest", "name": "MSTest", "description": "Microsoft's unit testing framework"},
-                {"id": "selenium", "name": "Selenium", "description": "Web application testing framework"}
-            ],
-            "Go": [
-                {"id": "testing", "name": "Go Testing", "description": "Built-in Go testing package"},
-                {"id": "ginkgo", "name": "Ginkgo", "description": "BDD-style testing framework for Go"},
-                {"id": "testify", "name": "Testify", "description": "Testing toolkit with common assertions"}
-            ],
-            "Ruby": [
-                {"id": "rspec", "name": "RSpec", "description": "Behavior-driven development framework"},
-                {"id": "minitest", "name": "Minitest", "description": "Complete suite of testing facilities"},
-                {"id": "cucumber", "name": "Cucumber", "description": "BDD testing framework"}
-            ]
-        }
-        
-        # Default frameworks for unknown languages
-        default_frameworks = [
-            {"id": "generic", "name": "Generic Testing", "description": "Language-agnostic testing approach"},
-            {"id": "selenium", "name": "Selenium", "description": "Web application testing framework"}
-        ]
-        
-        suggested_frameworks = frameworks.get(primary_language, default_frameworks)
+        # Framework suggestions based on language (catalog is loaded once from prompts.json)
+        suggested_frameworks = prompt_registry.frameworks_for(primary_language)
         
         return {
             "primary_language": primary_language,
@@ -315,72 +1126,85 @@ async def get_suggested_frameworks(request: RepoFilesRequest, token: str = Depen
 async def generate_summaries(request: GenerateSummariesRequest, token: str = Depends(get_github_token)):
     """Generate test case summaries using Google Gemini"""
     try:
+        if not request.filePaths:
+            raise HTTPException(status_code=400, detail="Provide filePaths")
+        
         # Extract owner and repo from URL
         repo_path = request.repoUrl.replace("https://github.com/", "")
         owner, repo = repo_path.split("/")
         
         # Fetch file contents
-        concatenated_content = ""
-        for file_path in request.filePaths:
-            try:
-                file_data = await fetch_github_api(
-                    f"https://api.github.com/repos/{owner}/{repo}/contents/{file_path}",
-                    token
-                )
-                
-                # Decode base64 content
-                content = base64.b64decode(file_data["content"]).decode("utf-8")
-                concatenated_content += f"// File: {file_path}\n{content}\n\n"
-                
-            except Exception as file_error:
-                print(f"Error fetching file {file_path}: {file_error}")
-                continue
-        
-        if not gemini_model:
-            raise HTTPException(status_code=500, detail="Gemini API not configured")
-        
-        # Framework-specific prompts
-        framework_prompts = {
-            "jest": "You are an expert Test Case Analyst. Your task is to analyze the following code and suggest a list of concise, one-sentence test case summaries. The target testing framework is Jest for JavaScript/React. Focus on component props, state changes, user interactions, and edge cases.",
-            "vitest": "You are an expert Test Case Analyst. Your task is to analyze the following code and suggest a list of concise, one-sentence test case summaries. The target testing framework is Vitest for modern JavaScript/TypeScript projects. Focus on unit tests, component testing, and performance testing.",
-            "mocha": "You are an expert Test Case Analyst. Your task is to analyze the following code and suggest a list of concise, one-sentence test case summaries. The target testing framework is Mocha for JavaScript. Focus on behavior-driven development and asynchronous testing patterns.",
-            "cypress": "You are an expert Test Case Analyst. Your task is to analyze the following code and suggest a list of concise, one-sentence test case summaries. The target testing framework is Cypress for end-to-end testing. Focus on user workflows, UI interactions, and integration testing.",
-            "playwright": "You are an expert Test Case Analyst. Your task is to analyze the following code and suggest a list of concise, one-sentence test case summaries. The target testing framework is Playwright for cross-browser testing. Focus on browser automation, API testing, and visual regression testing.",
-            "pytest": "You are an expert Test Case Analyst. Your task is to analyze the following code and suggest a list of concise, one-sentence test case summaries. The target testing framework is pytest for Python. Focus on fixtures, parametrized tests, and test discovery patterns.",
-            "unittest": "You are an expert Test Case Analyst. Your task is to analyze the following code and suggest a list of concise, one-sentence test case summaries. The target testing framework is unittest for Python. Focus on test cases, test suites, and assertion methods.",
-            "selenium": "You are an expert Test Case Analyst. Your task is to analyze the following code and suggest a list of concise, one-sentence test case summaries. The target testing framework is Selenium for web automation. Focus on element interactions, page navigation, and cross-browser compatibility.",
-            "junit": "You are an expert Test Case Analyst. Your task is to analyze the following code and suggest a list of concise, one-sentence test case summaries. The target testing framework is JUnit for Java. Focus on test methods, annotations, and lifecycle management.",
-            "testng": "You are an expert Test Case Analyst. Your task is to analyze the following code and suggest a list of concise, one-sentence test case summaries. The target testing framework is TestNG for Java. Focus on data-driven testing, parallel execution, and test configuration.",
-            "nunit": "You are an expert Test Case Analyst. Your task is to analyze the following code and suggest a list of concise, one-sentence test case summaries. The target testing framework is NUnit for .NET. Focus on test fixtures, assertions, and parameterized tests.",
-            "xunit": "You are an expert Test Case Analyst. Your task is to analyze the following code and suggest a list of concise, one-sentence test case summaries. The target testing framework is xUnit for .NET. Focus on fact-based testing, theory-based testing, and dependency injection.",
-            "rspec": "You are an expert Test Case Analyst. Your task is to analyze the following code and suggest a list of concise, one-sentence test case summaries. The target testing framework is RSpec for Ruby. Focus on behavior-driven development, describe blocks, and matchers.",
-            "testing": "You are an expert Test Case Analyst. Your task is to analyze the following code and suggest a list of concise, one-sentence test case summaries. The target testing framework is Go's built-in testing package. Focus on table-driven tests, benchmarks, and examples.",
-            "generic": "You are an expert Test Case Analyst. Your task is to analyze the following code and suggest a list of concise, one-sentence test case summaries. Use generic testing principles applicable to any framework. Focus on functionality, edge cases, and error handling."
-        }
+        files, failed_files = await fetch_file_contents(
+            owner, repo, request.filePaths, token, ref=request.ref, shas=request.fileShas
+        )
+        if not files:
+            # Summarizing an empty prompt would only spend quota on made-up test cases
+            raise HTTPException(status_code=502, detail="Failed to fetch source files")
         
-        base_prompt = framework_prompts.get(request.framework, framework_prompts["generic"])
+        llm = get_llm(request.framework)
         
-        # Create prompt
-        prompt = f"""{base_prompt} Return your response as a valid JSON array of strings. Do not include any other text, explanation, or markdown formatting.
-
-Code to analyze:
----
-{concatenated_content}
----"""
+        # Tag cached summaries with source blob SHAs so index refreshes can invalidate them
+        blob_tags = tuple(git_blob_sha(content) for _, content in files)
+        
+        # Split the selection into token-budgeted chunks; oversized files are split by function, not outlined,
+        # since summaries have no test case objective to pick relevant bodies by
+        chunks = chunk_files(files, SUMMARY_CHUNK_TOKENS, llm.count_tokens)
         
-        # Generate summaries using Gemini
-        response = gemini_model.generate_content(prompt)
-        summaries_text = response.text
+        # Map: summarize chunks concurrently (LLM_CONCURRENCY bounds the fan-out)
+        results = await asyncio.gather(*(
+            generate_cached(
+                llm, build_summaries_prompt(request.framework, chunk), request.cache, blob_tags,
+                schema=SUMMARIES_SCHEMA if LLM_JSON_MODE else None
+            )
+            for chunk in chunks
+        ))
         
-        # Parse the response
-        summaries = parse_json_response(summaries_text)
+        summary_lists = []
+        with span("llm.parse", chunks=len(results)):
+            for summaries_text, _ in results:
+                # Parse the response
+                summaries = parse_json_response(summaries_text)
+                
+                # Ensure we have a list
+                if not isinstance(summaries, list):
+                    summaries = [str(summaries)]
+                summary_lists.append(summaries)
         
-        # Ensure we return a list
-        if not isinstance(summaries, list):
-            summaries = [str(summaries)]
+        # Reduce: merge chunk summaries and drop duplicates
+        summaries = merge_summaries(summary_lists)
+        cached = all(chunk_cached for _, chunk_cached in results)
+        
+        # Cluster paraphrases, within this response and against earlier ones for the same file versions
+        clusters = []
+        if SUMMARY_DEDUP_THRESHOLD > 0:
+            # History is kept per file blob (its content at this commit) and framework, and each summary is
+            # only recorded for the files in the chunks that produced it
+            history_keys = {
+                path: (owner, repo, path, blob_sha, request.framework)
+                for (path, _), blob_sha in zip(files, blob_tags)
+            }
+            with span("summaries.dedup", summaries=len(summaries)):
+                clusters = cluster_summaries(
+                    summaries, SUMMARY_DEDUP_THRESHOLD, summary_history.get(history_keys.values())
+                )
+            summaries = [cluster["canonical"] for cluster in clusters]
+            sources = summary_sources(chunks, summary_lists)
+            for cluster in clusters:
+                paths = set().union(*(sources.get(member, set()) for member in cluster["members"]))
+                keys = [history_keys[path] for path in paths if path in history_keys]
+                summary_history.add(keys, [cluster["canonical"]])
         
-        return {"summaries": summaries}
+        return {
+            "summaries": summaries,
+            "clusters": clusters,
+            "failedFiles": failed_files,
+            "cached": cached,
+            "chunks": len(chunks),
+            "promptVersion": prompt_registry.version
+        }
         
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error generating summaries: {e}")
         raise HTTPException(status_code=500, detail="Failed to generate summaries")
@@ -389,49 +1213,152 @@ Code to analyze:
 async def generate_code(request: GenerateCodeRequest, token: str = Depends(get_github_token)):
     """Generate test code using Google Gemini"""
     try:
-        if not gemini_model:
-            raise HTTPException(status_code=500, detail="Gemini API not configured")
-        
-        # Framework-specific code generation prompts
-        framework_code_prompts = {
-            "jest": f"You are an expert Jest Test Code Generator. Your task is to write a complete and executable Jest test file based on the provided source code and the specific test case objective. Include necessary imports, setup, and teardown. Only output the raw code for the test file.",
-            "vitest": f"You are an expert Vitest Test Code Generator. Your task is to write a complete and executable Vitest test file based on the provided source code and the specific test case objective. Include necessary imports and modern ES6+ syntax. Only output the raw code for the test file.",
-            "mocha": f"You are an expert Mocha Test Code Generator. Your task is to write a complete and executable Mocha test file based on the provided source code and the specific test case objective. Include describe blocks, before/after hooks, and proper assertions. Only output the raw code for the test file.",
-            "cypress": f"You are an expert Cypress Test Code Generator. Your task is to write a complete and executable Cypress test file based on the provided source code and the specific test case objective. Focus on user interactions and page elements. Only output the raw code for the test file.",
-            "playwright": f"You are an expert Playwright Test Code Generator. Your task is to write a complete and executable Playwright test file based on the provided source code and the specific test case objective. Include page interactions and cross-browser testing patterns. Only output the raw code for the test file.",
-            "pytest": f"You are an expert pytest Test Code Generator. Your task is to write a complete and executable pytest test file based on the provided source code and the specific test case objective. Include fixtures, parametrize decorators, and proper assertions. Only output the raw code for the test file.",
-            "unittest": f"You are an expert unittest Test Code Generator. Your task is to write a complete and executable unittest test file based on the provided source code and the specific test case objective. Include TestCase class, setUp/tearDown methods, and assertions. Only output the raw code for the test file.",
-            "selenium": f"You are an expert Selenium Test Code Generator. Your task is to write a complete and executable Selenium test script based on the provided source code and the specific test case objective. Include WebDriver setup, element locators, and browser interactions. Only output the raw code for the test file.",
-            "junit": f"You are an expert JUnit Test Code Generator. Your task is to write a complete and executable JUnit test class based on the provided source code and the specific test case objective. Include proper annotations, setup methods, and assertions. Only output the raw code for the test file.",
-            "testng": f"You are an expert TestNG Test Code Generator. Your task is to write a complete and executable TestNG test class based on the provided source code and the specific test case objective. Include test groups, data providers, and proper annotations. Only output the raw code for the test file.",
-            "nunit": f"You are an expert NUnit Test Code Generator. Your task is to write a complete and executable NUnit test class based on the provided source code and the specific test case objective. Include test fixtures, setup/teardown methods, and assertions. Only output the raw code for the test file.",
-            "xunit": f"You are an expert xUnit Test Code Generator. Your task is to write a complete and executable xUnit test class based on the provided source code and the specific test case objective. Include fact-based tests, theory-based tests, and proper assertions. Only output the raw code for the test file.",
-            "rspec": f"You are an expert RSpec Test Code Generator. Your task is to write a complete and executable RSpec test file based on the provided source code and the specific test case objective. Include describe blocks, context blocks, and proper matchers. Only output the raw code for the test file.",
-            "testing": f"You are an expert Go Testing Code Generator. Your task is to write a complete and executable Go test file based on the provided source code and the specific test case objective. Include table-driven tests and proper error handling. Only output the raw code for the test file.",
-            "generic": f"You are an expert Test Code Generator. Your task is to write a complete and executable test file based on the provided source code and the specific test case objective. Use generic testing principles and best practices. Only output the raw code for the test file."
-        }
+        llm = get_llm(request.framework)
+        file_contents, failed_files = await resolve_code_sources(request, token, llm)
+        prompt = build_code_prompt(request.framework, request.summary, file_contents)
         
-        base_prompt = framework_code_prompts.get(request.framework, framework_code_prompts["generic"])
+        # Generate code, then check it and re-prompt with any syntax error
+        generated_code, cached = await generate_cached(llm, prompt, request.cache)
+        code, validation = await validate_code(
+            llm, request.framework, prompt, strip_code_fences(generated_code), request.cache
+        )
+        
+        return {
+            "code": code,
+            "cached": cached,
+            "validation": validation,
+            "failedFiles": failed_files,
+            "promptVersion": prompt_registry.version
+        }
         
-        # Create prompt
-        prompt = f"""{base_prompt} Do not include markdown fences (```), explanations, or any other text.
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error generating code: {e}")
+        raise HTTPException(status_code=500, detail="Failed to generate test code")
 
-**Test Case Objective:** {request.summary}
+@app.post("/api/generate/code/stream")
+async def generate_code_stream(request: GenerateCodeRequest, http_request: Request, token: str = Depends(get_github_token)):
+    """Stream generated test code as Server-Sent Events, stopping if the client disconnects"""
+    async def event_stream():
+        try:
+            # Source resolution errors (e.g. a malformed repoUrl) are reported as error events
+            llm = get_llm(request.framework)
+            file_contents, failed_files = await resolve_code_sources(request, token, llm)
+            prompt = build_code_prompt(request.framework, request.summary, file_contents)
+            if failed_files:
+                yield format_sse({"failedFiles": failed_files}, event="warning")
+            
+            cache_key = response_cache.make_key(llm.model_id, prompt, prompt_registry.version)
+            cached = response_cache.get(cache_key) if request.cache != "bypass" else None
+            if cached is not None:
+                yield format_sse({"text": cached})
+                code, validation = await validate_code(
+                    llm, request.framework, prompt, strip_code_fences(cached), request.cache
+                )
+                yield format_sse({"cached": True, "code": code, "validation": validation}, event="done")
+                return
+            chunks = []
+            async for text in stream_text(llm, prompt):
+                if await http_request.is_disconnected():
+                    print("Client disconnected, cancelling code generation")
+                    return
+                chunks.append(text)
+                yield format_sse({"text": text})
+            # Only complete generations are cached
+            text = "".join(chunks)
+            response_cache.set(cache_key, text)
+            # The streamed text may be wrapped in markdown fences or fail validation; send the
+            # cleaned (and, if it needed repairing, regenerated) code at the end
+            code, validation = await validate_code(
+                llm, request.framework, prompt, strip_code_fences(text), request.cache
+            )
+            yield format_sse({"cached": False, "code": code, "validation": validation}, event="done")
+        except HTTPException as e:
+            yield format_sse({"detail": e.detail}, event="error")
+        except Exception as e:
+            print(f"Error streaming code: {e}")
+            yield format_sse({"detail": "Failed to generate test code"}, event="error")
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
-**Source Code:**
----
-{request.fileContents}
----"""
+@app.post("/api/jobs")
+async def create_batch_job(request: BatchJobRequest, token: str = Depends(get_github_token)):
+    """Queue test code generation for many (file, summary, framework) items"""
+    try:
+        # Extract owner and repo from URL
+        repo_path = request.repoUrl.replace("https://github.com/", "")
+        owner, repo = repo_path.split("/")
         
-        # Generate code using Gemini
-        response = gemini_model.generate_content(prompt)
-        generated_code = response.text
+        # Resolve each file once up front so workers don't need the GitHub token
+        file_paths = list(dict.fromkeys(item.filePath for item in request.items))
+        files, failed_files = await fetch_file_contents(
+            owner, repo, file_paths, token, ref=request.ref, shas=request.fileShas
+        )
+        
+        job_id = await retry_busy(
+            job_store.create_job,
+            request.repoUrl,
+            dict(files),
+            [
+                {"file_path": item.filePath, "summary": item.summary, "framework": item.framework or request.framework}
+                for item in request.items
+            ],
+            {failure["path"]: failure["error"] for failure in failed_files},
+            owner=job_owner(token)
+        )
+        if job_pool:
+            job_pool.notify()
         
-        return {"code": generated_code}
+        return job_store.get_job(job_id)
         
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"Error generating code: {e}")
-        raise HTTPException(status_code=500, detail="Failed to generate test code")
+        print(f"Error creating batch job: {e}")
+        raise HTTPException(status_code=500, detail="Failed to create batch job")
+
+@app.get("/api/jobs/{job_id}")
+async def get_batch_job(job_id: str, token: str = Depends(get_github_token)):
+    """Get batch job progress and results (only for the token that submitted the job)"""
+    job = job_store.get_job(job_id, owner=job_owner(token))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/api/jobs/{job_id}/events")
+async def stream_batch_job(job_id: str, http_request: Request, token: str = Depends(get_github_token)):
+    """Stream batch job progress as Server-Sent Events until the job finishes"""
+    owner = job_owner(token)
+    if job_store.get_job(job_id, owner=owner) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    async def event_stream():
+        last_progress = None
+        while not await http_request.is_disconnected():
+            job = job_store.get_job(job_id, owner=owner)
+            if job is None:
+                # Deleted by the retention purge while streaming
+                yield format_sse({"detail": "Job not found"}, event="error")
+                return
+            progress = (job["queued"], job["running"], job["completed"], job["failed"])
+            if progress != last_progress:
+                last_progress = progress
+                yield format_sse(job, event="progress")
+            if job["status"] in TERMINAL_STATUSES:
+                yield format_sse({"status": job["status"]}, event="done")
+                return
+            await asyncio.sleep(JOB_EVENTS_INTERVAL)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 if __name__ == "__main__":
     import uvicorn
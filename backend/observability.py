@@ -0,0 +1,142 @@
+"""
+Prometheus metrics and optional OpenTelemetry tracing
+"""
+
+import os
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Callable, Dict, Iterator, Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client import multiprocess
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+# Buckets sized for LLM calls, which take seconds rather than milliseconds
+SLOW_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "API request latency by route", ["method", "route", "status"]
+)
+SPAN_LATENCY = Histogram(
+    "span_duration_seconds", "Duration of instrumented steps within a request", ["span"], buckets=SLOW_BUCKETS
+)
+GITHUB_REQUESTS = Counter("github_requests_total", "GitHub API responses", ["resource", "status"])
+GITHUB_LATENCY = Histogram("github_request_duration_seconds", "GitHub API response latency", ["resource"])
+GITHUB_BYTES = Counter("github_response_bytes_total", "Bytes received from the GitHub API", ["resource"])
+LLM_REQUESTS = Counter("llm_requests_total", "LLM calls by outcome", ["model", "operation", "outcome"])
+LLM_LATENCY = Histogram(
+    "llm_request_duration_seconds", "LLM call latency", ["model", "operation"], buckets=SLOW_BUCKETS
+)
+LLM_PROMPT_TOKENS = Counter("llm_prompt_tokens_total", "Estimated prompt tokens sent to the LLM", ["model"])
+CODE_VALIDATIONS = Counter(
+    "code_validations_total", "Generated test files checked for syntax errors", ["framework", "status"]
+)
+
+# Counters of cache stats() dicts exported as events; everything else numeric becomes a gauge
+CACHE_EVENTS = (
+    "hits", "disk_hits", "misses", "evictions", "invalidations", "executions", "coalesced", "abandoned"
+)
+
+_tracer = None
+
+
+def setup_tracing(service_name: str, endpoint: str) -> bool:
+    """Export spans to an OTLP/HTTP collector if the OpenTelemetry SDK is installed"""
+    global _tracer
+    try:
+        from opentelemetry import trace
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+    except ImportError:
+        print("OpenTelemetry SDK not installed, tracing disabled")
+        return False
+
+    provider = TracerProvider(resource=Resource.create({"service.name": service_name}))
+    provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter(endpoint=endpoint)))
+    trace.set_tracer_provider(provider)
+    _tracer = trace.get_tracer(service_name)
+    return True
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[None]:
+    """Time a step into span_duration_seconds, and trace it when tracing is enabled"""
+    start = time.perf_counter()
+    traced = _tracer.start_as_current_span(name, attributes=attributes) if _tracer is not None else nullcontext()
+    try:
+        with traced:
+            yield
+    finally:
+        SPAN_LATENCY.labels(name).observe(time.perf_counter() - start)
+
+
+class StatsCollector:
+    """Exports the app's existing stats() counters at scrape time, so they are not tracked twice"""
+
+    def __init__(self, caches: Dict[str, Callable[[], dict]], rate_limits: Callable[[], dict],
+                 parse_outcomes: Callable[[], dict]):
+        self.caches = caches
+        self.rate_limits = rate_limits
+        self.parse_outcomes = parse_outcomes
+
+    def collect(self):
+        events = CounterMetricFamily("cache_events", "Cache hits, misses and evictions", labels=["cache", "event"])
+        sizes = GaugeMetricFamily("cache_size", "Current cache size and limits", labels=["cache", "field"])
+        for cache, stats in self.caches.items():
+            for field, value in stats().items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                if field in CACHE_EVENTS:
+                    events.add_metric([cache, field], value)
+                else:
+                    sizes.add_metric([cache, field], value)
+        yield events
+        yield sizes
+
+        remaining = GaugeMetricFamily(
+            "github_rate_limit_remaining", "Last reported GitHub rate-limit budget", labels=["budget"]
+        )
+        throttled = CounterMetricFamily(
+            "github_rate_limit_throttled", "Requests delayed to stay within the budget", labels=["budget"]
+        )
+        for budget, stats in self.rate_limits().items():
+            if stats["remaining"] is not None:
+                remaining.add_metric([budget], stats["remaining"])
+            throttled.add_metric([budget], stats["throttled"])
+        yield remaining
+        yield throttled
+
+        parsed = CounterMetricFamily("llm_parse_outcomes", "How LLM responses were parsed", labels=["outcome"])
+        for outcome, count in self.parse_outcomes().items():
+            parsed.add_metric([outcome], count)
+        yield parsed
+
+
+_collector: Optional[StatsCollector] = None
+
+
+def register_stats_collector(collector: StatsCollector) -> None:
+    """Register the stats collector once (re-importing the app must not register it twice)"""
+    global _collector
+    if _collector is not None:
+        REGISTRY.unregister(_collector)
+    REGISTRY.register(collector)
+    _collector = collector
+
+
+def render_metrics() -> tuple:
+    """Return (body, content type) for the /metrics endpoint.
+
+    With several worker processes (PROMETHEUS_MULTIPROC_DIR set), counters and
+    histograms are aggregated across workers; the stats collector reports the
+    worker that served the scrape.
+    """
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        if _collector is not None:
+            registry.register(_collector)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
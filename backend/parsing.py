@@ -0,0 +1,102 @@
+"""
+Parsing of structured LLM output
+"""
+
+import json
+from typing import Optional
+
+# Response schema for summary generation: a JSON array of strings
+SUMMARIES_SCHEMA = {"type": "array", "items": {"type": "string"}}
+
+
+class ParseStats:
+    """Counts how LLM responses were parsed, so fallbacks and failures are visible"""
+
+    def __init__(self):
+        self.direct = 0
+        self.extracted = 0
+        self.failures = 0
+        self.fences_stripped = 0
+
+    def as_dict(self) -> dict:
+        return {
+            "direct": self.direct,
+            "extracted": self.extracted,
+            "failures": self.failures,
+            "fences_stripped": self.fences_stripped,
+        }
+
+
+parse_stats = ParseStats()
+
+
+def extract_json_array(text: str) -> Optional[list]:
+    """Find the first balanced JSON array in text that parses, in a single linear scan.
+
+    Brackets inside JSON strings are ignored once inside an array; quotes in
+    the surrounding prose are not treated as strings.
+    """
+    depth = 0
+    start = -1
+    in_string = False
+    escaped = False
+    for i, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+            continue
+        if char == "[":
+            if depth == 0:
+                start = i
+            depth += 1
+        elif depth > 0:
+            if char == '"':
+                in_string = True
+            elif char == "]":
+                depth -= 1
+                if depth == 0:
+                    try:
+                        value = json.loads(text[start:i + 1])
+                    except json.JSONDecodeError:
+                        continue
+                    if isinstance(value, list):
+                        return value
+    return None
+
+
+def strip_code_fences(text: str) -> str:
+    """Remove the opening and closing markdown fence lines around a fenced response, leaving other text unchanged"""
+    # Only a response that starts with a fence is unwrapped, so fences inside the code are left alone
+    stripped = text.strip()
+    if not stripped.startswith("```"):
+        return text
+    lines = stripped.split("\n")[1:]
+    if lines and lines[-1].strip() == "```":
+        lines.pop()
+    parse_stats.fences_stripped += 1
+    return "\n".join(lines).rstrip() + "\n"
+
+
+def parse_json_response(text: str) -> list:
+    """Parse the output of an LLM call to a JSON array."""
+    try:
+        # Try to parse as JSON directly
+        value = json.loads(text.strip())
+        parse_stats.direct += 1
+        return value
+    except json.JSONDecodeError:
+        pass
+
+    # If that fails, try to extract a JSON array from the text (including fenced output)
+    value = extract_json_array(text)
+    if value is not None:
+        parse_stats.extracted += 1
+        return value
+
+    # If all else fails, return a single-item list
+    parse_stats.failures += 1
+    return [text.strip()]
@@ -0,0 +1,48 @@
+"""
+Versioned prompt template registry loaded from prompts.json
+"""
+
+import json
+from string import Template
+from typing import Dict, List
+
+
+class PromptRegistry:
+    """Precompiled per-framework prompt templates and the framework catalog.
+
+    Templates are compiled once at load time, so rendering a prompt is a single
+    substitution. `version` identifies the prompt set and is included in
+    response cache keys, so editing prompts (or A/B testing two files) never
+    serves responses generated from another version.
+    """
+
+    def __init__(self, data: dict):
+        self.version = str(data["version"])
+        self._templates: Dict[str, Dict[str, Template]] = {}
+        for task in ("summaries", "code"):
+            wrapper = Template(data[task]["template"])
+            self._templates[task] = {
+                framework: Template(wrapper.safe_substitute(instructions=instructions))
+                for framework, instructions in data[task]["frameworks"].items()
+            }
+        self._repair = Template(data["repair"]["template"])
+        self._catalog: Dict[str, List[dict]] = data["catalog"]["languages"]
+        self._default_frameworks: List[dict] = data["catalog"]["default"]
+
+    @classmethod
+    def load(cls, path: str) -> "PromptRegistry":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def render(self, task: str, framework: str, **values: str) -> str:
+        """Render the prompt for a task ("summaries" or "code"), falling back to the generic framework"""
+        templates = self._templates[task]
+        return templates.get(framework, templates["generic"]).substitute(**values)
+
+    def render_repair(self, prompt: str, code: str, error: str) -> str:
+        """Render a follow-up to a code prompt asking the model to fix a test file that failed validation"""
+        return self._repair.substitute(prompt=prompt, code=code, error=error)
+
+    def frameworks_for(self, language: str) -> List[dict]:
+        """Suggested testing frameworks for a repository's primary language"""
+        return self._catalog.get(language, self._default_frameworks)
@@ -0,0 +1,142 @@
+"""
+GitHub rate-limit-aware request scheduling
+"""
+
+import hashlib
+import random
+import time
+from typing import Dict, Optional
+
+
+class RateLimitExceeded(Exception):
+    """Raised instead of sending a request that cannot succeed before the token's budget resets"""
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"GitHub rate limit exhausted, resets in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class RateBudget:
+    """Last known rate-limit state for one token and resource"""
+
+    def __init__(self):
+        self.limit: Optional[int] = None
+        self.remaining: Optional[int] = None
+        self.reset_at: Optional[float] = None
+        self.blocked_until = 0.0
+        self.next_slot = 0.0
+        self.throttled = 0
+        self.retries = 0
+
+
+class GitHubRateLimiter:
+    """Tracks GitHub rate-limit headers per token and paces requests before the budget runs out.
+
+    While a token has more than `reserve` requests left, requests go out
+    immediately. Below that, requests are spaced evenly over the time left until
+    the window resets, so the budget lasts the whole window instead of running
+    dry and failing every request at once. 429s and secondary-rate-limit 403s
+    block the token for Retry-After (or a jittered exponential backoff); an
+    exhausted primary budget blocks it until X-RateLimit-Reset and is not
+    retried when that is further away than `max_wait`; until then, requests
+    for that token fail at once with RateLimitExceeded rather than being sent.
+    """
+
+    def __init__(self, reserve: int = 100, max_wait: float = 30.0, base_delay: float = 1.0, max_retries: int = 3):
+        self.reserve = reserve
+        self.max_wait = max_wait
+        self.base_delay = base_delay
+        self.max_retries = max_retries
+        self._budgets: Dict[str, RateBudget] = {}
+
+    @staticmethod
+    def _key(token: str, resource: str) -> str:
+        return f"{hashlib.sha256(token.encode('utf-8')).hexdigest()[:12]}:{resource}"
+
+    def _budget(self, token: str, resource: str) -> RateBudget:
+        key = self._key(token, resource)
+        if key not in self._budgets:
+            self._budgets[key] = RateBudget()
+        return self._budgets[key]
+
+    def delay_before_request(self, token: str, resource: str = "core") -> float:
+        """Reserve a send slot and return how long to wait before sending"""
+        budget = self._budget(token, resource)
+        now = time.time()
+        if budget.blocked_until - now > self.max_wait:
+            budget.throttled += 1
+            raise RateLimitExceeded(budget.blocked_until - now)
+        slot = max(now, budget.blocked_until)
+
+        if (budget.remaining is not None and budget.reset_at and budget.reset_at > now
+                and budget.remaining <= self.reserve):
+            # Spread what is left of the budget over the rest of the window
+            interval = (budget.reset_at - now) / max(budget.remaining, 1)
+            slot = max(slot, budget.next_slot)
+            budget.next_slot = slot + interval
+
+        delay = min(slot - now, self.max_wait)
+        if delay > 0:
+            budget.throttled += 1
+        return max(0.0, delay)
+
+    def update(self, token: str, headers, resource: str = "core") -> None:
+        """Record the budget reported by a response's X-RateLimit-* headers"""
+        budget = self._budget(token, headers.get("X-RateLimit-Resource", resource))
+        try:
+            if "X-RateLimit-Limit" in headers:
+                budget.limit = int(headers["X-RateLimit-Limit"])
+            if "X-RateLimit-Remaining" in headers:
+                budget.remaining = int(headers["X-RateLimit-Remaining"])
+            if "X-RateLimit-Reset" in headers:
+                budget.reset_at = float(headers["X-RateLimit-Reset"])
+        except ValueError:
+            pass
+
+    def retry_delay(self, token: str, status_code: int, headers, body: str, attempt: int, resource: str = "core") -> Optional[float]:
+        """Return how long to wait before retrying a rate-limited response, or None if it should not be retried"""
+        exhausted = headers.get("X-RateLimit-Remaining") == "0"
+        secondary = "secondary rate limit" in body.lower()
+        if status_code != 429 and not (status_code == 403 and (secondary or exhausted)):
+            return None
+        if attempt >= self.max_retries:
+            return None
+
+        if headers.get("Retry-After"):
+            try:
+                delay = float(headers["Retry-After"])
+            except ValueError:
+                delay = self.base_delay
+        elif exhausted and headers.get("X-RateLimit-Reset"):
+            try:
+                reset_at = float(headers["X-RateLimit-Reset"])
+            except ValueError:
+                reset_at = time.time() + self.base_delay
+            delay = reset_at - time.time()
+            if delay > self.max_wait:
+                # The primary budget is gone until the window resets; retrying sooner cannot succeed
+                budget = self._budget(token, resource)
+                budget.blocked_until = max(budget.blocked_until, reset_at)
+                return None
+        else:
+            # Jittered exponential backoff
+            delay = self.base_delay * (2 ** attempt) * random.uniform(0.5, 1.5)
+        delay = min(max(delay, 0.0), self.max_wait)
+
+        budget = self._budget(token, resource)
+        budget.blocked_until = max(budget.blocked_until, time.time() + delay)
+        budget.retries += 1
+        return delay
+
+    def stats(self) -> dict:
+        """Return the current budget per token (hashed) and resource"""
+        return {
+            key: {
+                "limit": budget.limit,
+                "remaining": budget.remaining,
+                "reset_at": budget.reset_at,
+                "throttled": budget.throttled,
+                "retries": budget.retries,
+            }
+            for key, budget in self._budgets.items()
+        }
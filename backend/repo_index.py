@@ -0,0 +1,336 @@
+"""
+Incremental repository file index that reuses unchanged subtrees between commits
+"""
+
+import asyncio
+import bisect
+import codecs
+import hashlib
+import json
+import posixpath
+import re
+from collections import OrderedDict
+from typing import AsyncContextManager, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+
+TREE_ARRAY_START = re.compile(r'"tree"\s*:\s*\[')
+TRUNCATED_TRUE = re.compile(r'"truncated"\s*:\s*true')
+
+
+def git_blob_sha(text: Union[str, bytes]) -> str:
+    """Compute the git blob SHA of file contents locally"""
+    data = text.encode("utf-8") if isinstance(text, str) else text
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+class TreeStream:
+    """Incrementally parses a git/trees response, yielding entries without loading the whole document.
+
+    Only the current, partially received entry is buffered, so memory stays flat
+    however large the tree is. After iteration, `truncated` tells whether GitHub
+    cut the recursive listing short.
+    """
+
+    def __init__(self, chunks: AsyncIterator[bytes]):
+        self.chunks = chunks
+        self.truncated = False
+
+    async def __aiter__(self) -> AsyncIterator[dict]:
+        decoder = json.JSONDecoder()
+        text_decoder = codecs.getincrementaldecoder("utf-8")()
+        buffer = ""
+        pos = 0
+        in_array = False
+        done = False
+        exhausted = False
+        chunks = self.chunks.__aiter__()
+
+        while not done:
+            if not exhausted:
+                try:
+                    buffer = buffer[pos:] + text_decoder.decode(await chunks.__anext__())
+                except StopAsyncIteration:
+                    buffer = buffer[pos:] + text_decoder.decode(b"", final=True)
+                    exhausted = True
+                pos = 0
+            elif not in_array:
+                return
+
+            if not in_array:
+                match = TREE_ARRAY_START.search(buffer)
+                if match is None:
+                    # Keep a short tail in case the marker spans two chunks
+                    pos = max(0, len(buffer) - 32)
+                    continue
+                in_array = True
+                pos = match.end()
+
+            while True:
+                while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                    pos += 1
+                if pos >= len(buffer):
+                    break
+                if buffer[pos] == "]":
+                    done = True
+                    pos += 1
+                    break
+                try:
+                    entry, end = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    if exhausted:
+                        raise
+                    break  # Entry is incomplete; wait for more data
+                pos = end
+                yield entry
+            if exhausted and not done:
+                raise ValueError("Tree response ended before the tree array closed")
+
+        # The truncated flag follows the tree array
+        rest = buffer[pos:]
+        async for chunk in chunks:
+            rest += text_decoder.decode(chunk)
+        self.truncated = bool(TRUNCATED_TRUE.search(rest))
+
+
+async def walk_tree(fetch_json: Callable[..., Awaitable[dict]], owner: str, repo: str, token: str,
+                    tree_ish: str) -> AsyncIterator[Tuple[str, str, Optional[int]]]:
+    """Yield (path, sha, size) for every blob by listing directories one at a time (for truncated trees)"""
+    pending = [("", tree_ish)]
+    while pending:
+        dir_path, tree_sha = pending.pop()
+        tree = await fetch_json(f"https://api.github.com/repos/{owner}/{repo}/git/trees/{tree_sha}", token)
+        for item in tree.get("tree", []):
+            path = posixpath.join(dir_path, item["path"]) if dir_path else item["path"]
+            if item.get("type") == "blob":
+                yield path, item["sha"], item.get("size")
+            elif item.get("type") == "tree":
+                pending.append((path, item["sha"]))
+
+
+class DirEntry:
+    """One directory of a tree: its SHA, blobs as (name, sha, size), and subdirectory names"""
+
+    __slots__ = ("sha", "blobs", "subdirs")
+
+    def __init__(self, sha: str):
+        self.sha = sha
+        self.blobs: List[Tuple[str, str, Optional[int]]] = []
+        self.subdirs: List[str] = []
+
+
+class RepoSnapshot:
+    """Indexed tree of one commit"""
+
+    def __init__(self, commit_sha: str, dirs: Dict[str, DirEntry], from_archive: bool = False):
+        self.commit_sha = commit_sha
+        self.dirs = dirs
+        # Built from a repository archive, so subtree SHAs are unknown and cannot be diffed
+        self.from_archive = from_archive
+        self._sorted = None
+
+    def files(self) -> Dict[str, Tuple[str, Optional[int]]]:
+        """Map every blob path to (sha, size)"""
+        result = {}
+        for dir_path, entry in self.dirs.items():
+            for name, sha, size in entry.blobs:
+                result[posixpath.join(dir_path, name) if dir_path else name] = (sha, size)
+        return result
+
+    def sorted_files(self) -> List[Tuple[str, str, Optional[int]]]:
+        """All blobs as (path, sha, size) sorted by path, built once per snapshot"""
+        if self._sorted is None:
+            self._sorted = sorted((path, sha, size) for path, (sha, size) in self.files().items())
+        return self._sorted
+
+    def page(self, after: Optional[str], limit: int, prefix: str = "",
+             suffixes: Optional[tuple] = None) -> Tuple[List[Tuple[str, str, Optional[int]]], Optional[str]]:
+        """Return up to `limit` blobs sorted after the `after` path, and the cursor for the next page"""
+        files = self.sorted_files()
+        start = bisect.bisect_right(files, (after, chr(0x10FFFF))) if after else 0
+        if prefix:
+            start = max(start, bisect.bisect_left(files, (prefix,)))
+        page = []
+        for i in range(start, len(files)):
+            path = files[i][0]
+            if prefix and not path.startswith(prefix):
+                break
+            if suffixes and not path.endswith(suffixes):
+                continue
+            page.append(files[i])
+            if len(page) == limit:
+                return page, path if i + 1 < len(files) else None
+        return page, None
+
+
+class RepoIndex:
+    """Per-repository file index keyed by (owner, repo, ref).
+
+    The first refresh downloads the recursive tree once; with `open_tree_stream`
+    its entries are indexed as they are parsed off the wire, so the raw listing
+    is never held in memory. Later refreshes check
+    the head commit SHA (a tiny request) and return the cached index if it has
+    not moved; otherwise only directories whose tree SHA changed are listed
+    again, and unchanged subtrees are carried over from the previous snapshot.
+
+    When GitHub truncates the recursive listing and `fetch_archive_listing` is
+    given, the index is built from the repository archive (one download)
+    instead of listing every directory separately.
+    """
+
+    def __init__(self, fetch_json: Callable[..., Awaitable[dict]], fetch_commit_sha: Callable[..., Awaitable[str]],
+                 max_repos: int = 64, concurrency: int = 8,
+                 fetch_archive_listing: Optional[Callable[..., Awaitable[List[Tuple[str, str, Optional[int]]]]]] = None,
+                 open_tree_stream: Optional[Callable[..., AsyncContextManager[TreeStream]]] = None):
+        self.fetch_json = fetch_json
+        self.open_tree_stream = open_tree_stream
+        self.fetch_commit_sha = fetch_commit_sha
+        self.fetch_archive_listing = fetch_archive_listing
+        self.max_repos = max_repos
+        self.concurrency = concurrency
+        self._snapshots = OrderedDict()
+        self._locks: Dict[tuple, asyncio.Lock] = {}
+        self.full_fetches = 0
+        self.incremental_fetches = 0
+        self.archive_fetches = 0
+        self.unchanged = 0
+
+    async def refresh(self, owner: str, repo: str, token: str, ref: str = "HEAD") -> Tuple[RepoSnapshot, Dict[str, str]]:
+        """Bring the index up to date and return (snapshot, {path: old_sha} for blobs that changed or were removed)"""
+        key = (owner, repo, ref)
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            # Always checked with the caller's token, which doubles as the access check
+            commit_sha = await self.fetch_commit_sha(owner, repo, ref, token)
+            previous = self._snapshots.get(key)
+            if previous is not None and previous.commit_sha == commit_sha:
+                self._snapshots.move_to_end(key)
+                self.unchanged += 1
+                return previous, {}
+
+            commit = await self.fetch_json(f"https://api.github.com/repos/{owner}/{repo}/git/commits/{commit_sha}", token)
+            root_sha = commit["tree"]["sha"]
+            if previous is not None and previous.from_archive:
+                # Too large to list through the API last time; a new archive is still cheaper
+                snapshot = await self._archive_snapshot(owner, repo, token, commit_sha, root_sha)
+                new_files = snapshot.files()
+                changed = {
+                    path: sha for path, (sha, _) in previous.files().items()
+                    if new_files.get(path, (None,))[0] != sha
+                }
+            elif previous is None:
+                snapshot = await self._full_snapshot(owner, repo, token, commit_sha, root_sha)
+                self.full_fetches += 1
+                changed = {}
+            else:
+                snapshot = await self._incremental_snapshot(owner, repo, token, commit_sha, root_sha, previous)
+                self.incremental_fetches += 1
+                new_files = snapshot.files()
+                changed = {
+                    path: sha for path, (sha, _) in previous.files().items()
+                    if new_files.get(path, (None,))[0] != sha
+                }
+
+            self._snapshots[key] = snapshot
+            self._snapshots.move_to_end(key)
+            while len(self._snapshots) > self.max_repos:
+                evicted_key, _ = self._snapshots.popitem(last=False)
+                self._locks.pop(evicted_key, None)
+            return snapshot, changed
+
+    async def _list_tree(self, owner: str, repo: str, token: str, tree_sha: str, recursive: bool = False) -> dict:
+        return await self.fetch_json(
+            f"https://api.github.com/repos/{owner}/{repo}/git/trees/{tree_sha}",
+            token,
+            params={"recursive": 1} if recursive else None
+        )
+
+    async def _full_snapshot(self, owner: str, repo: str, token: str, commit_sha: str, root_sha: str) -> RepoSnapshot:
+        dirs = {"": DirEntry(root_sha)}
+
+        def add(item: dict) -> None:
+            # Parents are created on demand, so entries can be indexed in any order
+            parent, name = posixpath.split(item["path"])
+            if item.get("type") == "tree":
+                dirs.setdefault(item["path"], DirEntry(item["sha"])).sha = item["sha"]
+                dirs.setdefault(parent, DirEntry(None)).subdirs.append(name)
+            elif item.get("type") == "blob":
+                dirs.setdefault(parent, DirEntry(None)).blobs.append((name, item["sha"], item.get("size")))
+
+        if self.open_tree_stream is not None:
+            async with self.open_tree_stream(owner, repo, token, root_sha) as entries:
+                async for item in entries:
+                    add(item)
+            truncated = entries.truncated
+        else:
+            tree = await self._list_tree(owner, repo, token, root_sha, recursive=True)
+            for item in tree.get("tree", []):
+                add(item)
+            truncated = tree.get("truncated")
+
+        if truncated:
+            # The recursive listing was cut off; read the archive, or walk every directory
+            if self.fetch_archive_listing is not None:
+                return await self._archive_snapshot(owner, repo, token, commit_sha, root_sha)
+            return await self._incremental_snapshot(owner, repo, token, commit_sha, root_sha, None)
+        return RepoSnapshot(commit_sha, dirs)
+
+    async def _archive_snapshot(self, owner: str, repo: str, token: str, commit_sha: str, root_sha: str) -> RepoSnapshot:
+        listing = await self.fetch_archive_listing(owner, repo, token, commit_sha)
+        self.archive_fetches += 1
+        dirs = {"": DirEntry(root_sha)}
+
+        def ensure_dir(dir_path: str) -> None:
+            # Directory tree SHAs are not in the archive
+            if dir_path in dirs:
+                return
+            dirs[dir_path] = DirEntry(None)
+            parent, name = posixpath.split(dir_path)
+            ensure_dir(parent)
+            dirs[parent].subdirs.append(name)
+
+        for path, sha, size in listing:
+            parent, name = posixpath.split(path)
+            ensure_dir(parent)
+            dirs[parent].blobs.append((name, sha, size))
+        return RepoSnapshot(commit_sha, dirs, from_archive=True)
+
+    async def _incremental_snapshot(self, owner: str, repo: str, token: str, commit_sha: str, root_sha: str,
+                                    previous: Optional[RepoSnapshot]) -> RepoSnapshot:
+        dirs: Dict[str, DirEntry] = {}
+        semaphore = asyncio.Semaphore(max(1, self.concurrency))
+
+        def reuse(dir_path: str) -> None:
+            # Carry an unchanged subtree over from the previous snapshot without any requests
+            entry = previous.dirs[dir_path]
+            dirs[dir_path] = entry
+            for name in entry.subdirs:
+                reuse(posixpath.join(dir_path, name) if dir_path else name)
+
+        async def walk(dir_path: str, tree_sha: str) -> None:
+            if previous is not None and dir_path in previous.dirs and previous.dirs[dir_path].sha == tree_sha:
+                reuse(dir_path)
+                return
+            async with semaphore:
+                tree = await self._list_tree(owner, repo, token, tree_sha)
+            entry = DirEntry(tree_sha)
+            children = []
+            for item in tree.get("tree", []):
+                if item.get("type") == "blob":
+                    entry.blobs.append((item["path"], item["sha"], item.get("size")))
+                elif item.get("type") == "tree":
+                    entry.subdirs.append(item["path"])
+                    child_path = posixpath.join(dir_path, item["path"]) if dir_path else item["path"]
+                    children.append(walk(child_path, item["sha"]))
+            dirs[dir_path] = entry
+            await asyncio.gather(*children)
+
+        await walk("", root_sha)
+        return RepoSnapshot(commit_sha, dirs)
+
+    def stats(self) -> dict:
+        return {
+            "repos": len(self._snapshots),
+            "full_fetches": self.full_fetches,
+            "incremental_fetches": self.incremental_fetches,
+            "archive_fetches": self.archive_fetches,
+            "unchanged": self.unchanged,
+        }
@@ -1,16 +1,75 @@
 #!/usr/bin/env python3
 """
 Workik AI Test Case Generator Backend Server
+
+    python server.py          # development: one process with auto-reload
+    python server.py --prod   # production: several worker processes, no reload
 """
 
+import argparse
+import os
+import shutil
+import tempfile
+
 import uvicorn
-from main import app
+from dotenv import load_dotenv
+
+
+def configure_shared_state() -> None:
+    """Point every worker at shared, on-disk caches so they don't each start cold.
+
+    Runs before the workers import main, so they inherit these defaults;
+    values set in the environment or .env take precedence.
+    """
+    os.environ.setdefault("RESPONSE_CACHE_BACKEND", "sqlite")
+    os.environ.setdefault("HTTP_CACHE_BACKEND", "sqlite")
+    os.environ.setdefault("BLOB_CACHE_DIR", ".cache/blobs")
+
+    # Aggregate Prometheus metrics across workers; stale files from a previous run are cleared
+    metrics_dir = os.environ.setdefault(
+        "PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "test-case-generator-metrics")
+    )
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the Workik AI Test Case Generator API")
+    parser.add_argument("--prod", action="store_true", help="Run multiple workers without auto-reload")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument(
+        "--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1))),
+        help="Worker processes in production mode (default: WEB_CONCURRENCY or the CPU count)"
+    )
+    args = parser.parse_args()
+
+    if not args.prod:
+        uvicorn.run(
+            "main:app",
+            host=args.host,
+            port=args.port,
+            reload=True,
+            log_level="info"
+        )
+        return
+
+    # Loaded here so .env settings win over the shared-state defaults below
+    load_dotenv()
+    if args.workers > 1:
+        configure_shared_state()
 
-if __name__ == "__main__":
     uvicorn.run(
         "main:app",
-        host="0.0.0.0",
-        port=8000,
-        reload=True,
-        log_level="info"
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        log_level="info",
+        proxy_headers=True,
+        # On SIGTERM, stop accepting connections and give in-flight requests (and streams) time to finish
+        timeout_graceful_shutdown=int(os.getenv("GRACEFUL_SHUTDOWN_TIMEOUT", "30"))
     )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+"""
+Repository tarball ingestion: one archive download per commit, files served by memory-mapped reads
+"""
+
+import asyncio
+import mmap
+import os
+import tarfile
+import zlib
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from repo_index import git_blob_sha
+
+
+def index_tar(path: str) -> Dict[str, Tuple[int, int]]:
+    """Map each regular file in an uncompressed tar to (data offset, size), without reading file data.
+
+    GitHub archives put everything under a single `<owner>-<repo>-<sha>/`
+    directory, which is stripped so paths match the git tree.
+    """
+    entries = {}
+    with tarfile.open(path, "r:") as archive:
+        for member in archive:
+            if not member.isfile():
+                continue
+            parts = member.name.split("/", 1)
+            if len(parts) == 2 and parts[1]:
+                entries[parts[1]] = (member.offset_data, member.size)
+    return entries
+
+
+class RepoArchive:
+    """An indexed, uncompressed repository archive on disk, read through mmap.
+
+    `readers` counts the callers holding it (see TarballStore.open); an evicted
+    archive is only closed once the last of them is done.
+    """
+
+    def __init__(self, path: str, entries: Dict[str, Tuple[int, int]]):
+        self.path = path
+        self.entries = entries
+        self.readers = 0
+        self.evicted = False
+        self._file = open(path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+
+    def read(self, path: str) -> Optional[bytes]:
+        """Return a file's bytes, or None if the archive has no such file"""
+        entry = self.entries.get(path)
+        if entry is None:
+            return None
+        offset, size = entry
+        return self._mmap[offset:offset + size] if size else b""
+
+    def read_texts(self, paths: List[str]) -> Tuple[Dict[str, Tuple[str, str]], Dict[str, str]]:
+        """Decode files as UTF-8, returning ({path: (blob sha, text)}, {path: error}); missing paths are in neither"""
+        texts, errors = {}, {}
+        for path in paths:
+            data = self.read(path)
+            if data is None:
+                continue
+            try:
+                texts[path] = (git_blob_sha(data), data.decode("utf-8"))
+            except UnicodeDecodeError:
+                errors[path] = "Binary file skipped"
+        return texts, errors
+
+    def listing(self) -> List[Tuple[str, str, int]]:
+        """All files as (path, git blob sha, size), hashing contents locally"""
+        return [(path, git_blob_sha(self.read(path)), size) for path, (_, size) in self.entries.items()]
+
+    def close(self) -> None:
+        if self._mmap is not None:
+            self._mmap.close()
+        self._file.close()
+
+
+class TarballStore:
+    """Downloads and indexes repository archives, keyed by (owner, repo, commit SHA).
+
+    Commits are immutable, so an archive is downloaded once and reused until it
+    is evicted. The gzip stream is decompressed while it downloads into a spool
+    file, so memory use does not grow with repository size. Evicted archives
+    stay open until every caller using them has finished.
+    """
+
+    def __init__(self, download: Callable[..., AsyncIterator[bytes]], directory: str, max_archives: int = 4):
+        self.download = download
+        self.directory = directory
+        self.max_archives = max_archives
+        self._archives = OrderedDict()
+        self._locks: Dict[tuple, asyncio.Lock] = {}
+        self.downloads = 0
+        self.hits = 0
+        self.bytes_downloaded = 0
+        os.makedirs(directory, exist_ok=True)
+
+    @asynccontextmanager
+    async def open(self, owner: str, repo: str, commit_sha: str, token: str) -> AsyncIterator[RepoArchive]:
+        """Use the archive for a commit, downloading it if needed; it stays open until the block exits"""
+        archive = await self._acquire(owner, repo, commit_sha, token)
+        try:
+            yield archive
+        finally:
+            archive.readers -= 1
+            if archive.evicted and archive.readers == 0:
+                self._dispose(archive)
+
+    def _dispose(self, archive: RepoArchive) -> None:
+        archive.close()
+        # The commit may have been opened again from the same file since it was evicted
+        if any(current.path == archive.path for current in self._archives.values()):
+            return
+        try:
+            os.remove(archive.path)
+        except OSError as e:
+            print(f"Error removing archive {archive.path}: {e}")
+
+    async def _acquire(self, owner: str, repo: str, commit_sha: str, token: str) -> RepoArchive:
+        key = (owner, repo, commit_sha)
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            if key in self._archives:
+                self._archives.move_to_end(key)
+                self.hits += 1
+                archive = self._archives[key]
+                archive.readers += 1
+                return archive
+
+            path = os.path.join(self.directory, f"{owner}-{repo}-{commit_sha}.tar")
+            # Spool files are only renamed into place once complete, so one left by another
+            # worker process (or a previous run) can be used as is
+            if not os.path.exists(path):
+                await self._download(owner, repo, commit_sha, token, path)
+
+            # Scanning tar headers seeks through the whole file; keep it off the event loop
+            loop = asyncio.get_running_loop()
+            entries = await loop.run_in_executor(None, index_tar, path)
+            archive = RepoArchive(path, entries)
+            archive.readers += 1
+
+            self._archives[key] = archive
+            while len(self._archives) > self.max_archives:
+                evicted_key, evicted = self._archives.popitem(last=False)
+                self._locks.pop(evicted_key, None)
+                # Reads may still be running in executor threads; the last one removes it
+                evicted.evicted = True
+                if evicted.readers == 0:
+                    self._dispose(evicted)
+            return archive
+
+    async def _download(self, owner: str, repo: str, commit_sha: str, token: str, path: str) -> None:
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        loop = asyncio.get_running_loop()
+        try:
+            with open(tmp_path, "wb") as spool:
+                # Decompressing and writing are blocking; do them off the event loop, one chunk at a time
+                def spool_chunk(chunk: bytes) -> None:
+                    spool.write(decompressor.decompress(chunk))
+
+                async for chunk in self.download(owner, repo, commit_sha, token):
+                    self.bytes_downloaded += len(chunk)
+                    await loop.run_in_executor(None, spool_chunk, chunk)
+                await loop.run_in_executor(None, lambda: spool.write(decompressor.flush()))
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self.downloads += 1
+
+    def stats(self) -> dict:
+        return {
+            "archives": len(self._archives),
+            "max_archives": self.max_archives,
+            "downloads": self.downloads,
+            "hits": self.hits,
+            "bytes_downloaded": self.bytes_downloaded,
+        }
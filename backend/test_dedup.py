@@ -0,0 +1,50 @@
+"""
+Tests for near-duplicate summary clustering (run with `python -m pytest test_dedup.py`)
+"""
+
+import pytest
+
+from dedup import cluster_summaries
+
+# The SUMMARY_DEDUP_THRESHOLD default in main.py
+THRESHOLD = 0.4
+
+
+@pytest.mark.parametrize("first, second", [
+    ("handles empty input", "returns error on empty input"),
+    ("handles empty input", "empty input is handled gracefully"),
+])
+def test_paraphrases_merge(first, second):
+    clusters = cluster_summaries([first, second], THRESHOLD)
+    assert clusters == [{"canonical": first, "members": [first, second], "fromHistory": False}]
+
+
+@pytest.mark.parametrize("first, second", [
+    ("adds two positive numbers", "adds two negative numbers"),
+    ("renders the button when disabled is true", "renders the button when disabled is false"),
+    ("throws when input is null", "throws when input is undefined"),
+    ("calls onClick when button is clicked", "does not call onClick when button is disabled"),
+    ("renders Link with the disabled prop", "renders Button with the disabled prop"),
+    ("returns 404 when user is missing", "returns 404 when order is missing"),
+])
+def test_distinct_tests_stay_separate(first, second):
+    clusters = cluster_summaries([first, second], THRESHOLD)
+    assert [cluster["canonical"] for cluster in clusters] == [first, second]
+
+
+def test_history_canonical_with_another_subject_is_not_swapped_in():
+    clusters = cluster_summaries(
+        ["renders Button with the disabled prop"], THRESHOLD, history=["renders Link with the disabled prop"]
+    )
+    assert clusters == [{
+        "canonical": "renders Button with the disabled prop",
+        "members": ["renders Button with the disabled prop"],
+        "fromHistory": False,
+    }]
+
+
+def test_history_paraphrase_keeps_earlier_wording():
+    clusters = cluster_summaries(["returns error on empty input"], THRESHOLD, history=["handles empty input"])
+    assert clusters == [{
+        "canonical": "handles empty input", "members": ["returns error on empty input"], "fromHistory": True,
+    }]
@@ -0,0 +1,158 @@
+"""
+Syntax validation of generated test files, run in a process pool off the event loop
+"""
+
+import asyncio
+import multiprocessing
+import os
+import shlex
+import shutil
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional
+
+PYTHON_FRAMEWORKS = {"pytest", "unittest"}
+
+# Command-line checkers used when their tool is installed: {framework: {"command", "suffix"}}.
+# "{file}" is replaced by a temporary file holding the code; a non-zero exit status is a failure.
+ESBUILD = {"command": "esbuild {file} --log-level=error", "suffix": ".tsx"}  # Parses JS, JSX and TypeScript
+DEFAULT_COMMANDS = {
+    "jest": ESBUILD,
+    "vitest": ESBUILD,
+    "mocha": ESBUILD,
+    "cypress": ESBUILD,
+    "playwright": ESBUILD,
+    "rspec": {"command": "ruby -c {file}", "suffix": ".rb"},
+    "testing": {"command": "gofmt -e -l {file}", "suffix": ".go"},
+}
+
+# Longest error message passed back (and into repair prompts)
+MAX_ERROR_CHARS = 2000
+
+
+def check_python(code: str) -> Optional[str]:
+    """Compile Python source, returning the syntax error or None"""
+    try:
+        compile(code, "test_generated.py", "exec")
+    except SyntaxError as e:
+        line = f": {e.text.strip()}" if e.text else ""
+        return f"{type(e).__name__}: {e.msg} (line {e.lineno}){line}"
+    except ValueError as e:  # e.g. null bytes
+        return f"ValueError: {e}"
+    return None
+
+
+def check_command(code: str, command: str, suffix: str, timeout: float) -> Optional[str]:
+    """Run a checker command on the code in a temporary file, returning its output on failure or None"""
+    fd, path = tempfile.mkstemp(prefix="test_generated_", suffix=suffix)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(code)
+        args = [arg.replace("{file}", path) for arg in shlex.split(command)]
+        result = subprocess.run(args, capture_output=True, text=True, timeout=timeout)
+        if result.returncode == 0:
+            return None
+        output = (result.stderr or result.stdout).replace(path, os.path.basename(path)).strip()
+        return output or f"{args[0]} exited with status {result.returncode}"
+    finally:
+        os.remove(path)
+
+
+def run_check(code: str, framework: str, commands: Dict[str, dict], timeout: float) -> dict:
+    """Validate one generated file (runs in a worker process)"""
+    start = time.perf_counter()
+    checker = None
+    status = "skipped"
+    error = None
+    if not code.strip():
+        checker, status, error = "empty", "failed", "The response contained no code"
+    elif framework in PYTHON_FRAMEWORKS:
+        checker = "python-compile"
+        error = check_python(code)
+        status = "failed" if error else "passed"
+    elif framework in commands:
+        command, suffix = commands[framework]["command"], commands[framework].get("suffix", "")
+        checker = shlex.split(command)[0]
+        try:
+            error = check_command(code, command, suffix, timeout)
+            status = "failed" if error else "passed"
+        except subprocess.TimeoutExpired:
+            status, error = "skipped", f"{checker} timed out after {timeout:g}s"
+        except OSError as e:
+            status, error = "skipped", f"{checker} could not run: {e}"
+    return {
+        "status": status,
+        "checker": checker,
+        "error": error[:MAX_ERROR_CHARS] if error else None,
+        "seconds": round(time.perf_counter() - start, 4),
+    }
+
+
+class CodeValidator:
+    """Checks generated test files in a bounded process pool.
+
+    Parsing and compiling are CPU-bound and checker commands block, so they run
+    in worker processes rather than on the event loop. Frameworks without a
+    built-in or configured checker whose tool is installed are reported as
+    "skipped". The pool is started on first use with the spawn method, which is
+    safe alongside the server's threads.
+    """
+
+    def __init__(self, workers: int = 2, timeout: float = 10.0, commands: Optional[Dict[str, dict]] = None):
+        self.workers = workers
+        self.timeout = timeout
+        configured = {**DEFAULT_COMMANDS, **(commands or {})}
+        # Only checkers whose tool is on PATH; resolved once, in the parent process
+        self.commands = {
+            framework: spec for framework, spec in configured.items()
+            if shutil.which(shlex.split(spec["command"])[0])
+        }
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self.counts = {"passed": 0, "failed": 0, "skipped": 0}
+        self.repairs = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.workers > 0
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._pool
+
+    async def validate(self, code: str, framework: str) -> dict:
+        """Return {"status": "passed" | "failed" | "skipped", "checker", "error", "seconds"}"""
+        if not self.enabled:
+            result = {"status": "skipped", "checker": None, "error": None, "seconds": 0.0}
+        else:
+            loop = asyncio.get_running_loop()
+            try:
+                result = await loop.run_in_executor(
+                    self._get_pool(), run_check, code, framework, self.commands, self.timeout
+                )
+            except (BrokenProcessPool, RuntimeError) as e:
+                # A worker died (e.g. killed for memory) or could not start; validation is
+                # best effort, so report it skipped and start a fresh pool next time
+                print(f"Validation worker pool failed: {e}")
+                self.close()
+                result = {"status": "skipped", "checker": None, "error": "Validation unavailable", "seconds": 0.0}
+        self.counts[result["status"]] += 1
+        return result
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "frameworks": sorted(PYTHON_FRAMEWORKS | set(self.commands)),
+            **self.counts,
+            "repairs": self.repairs,
+        }
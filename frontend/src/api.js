@@ -18,6 +18,33 @@ apiClient.interceptors.request.use((config) => {
   return config;
 });
 
+// Read a Server-Sent Events response, calling onEvent(event, data) per message
+const readEventStream = async (response, onEvent) => {
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    let boundary;
+    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+      const message = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+
+      let event = 'message';
+      let data = '';
+      for (const line of message.split('\n')) {
+        if (line.startsWith('event:')) event = line.slice(6).trim();
+        else if (line.startsWith('data:')) data += line.slice(5).trim();
+      }
+      onEvent(event, data ? JSON.parse(data) : {});
+    }
+  }
+};
+
 export const api = {
   // Authentication
   getGitHubAuthUrl: () => `${API_BASE_URL}/auth/github`,
@@ -28,13 +55,41 @@ export const api = {
   // Repositories
   getRepos: () => apiClient.get('/repos'),
   getRepoFiles: (repoUrl) => apiClient.post('/repo/files', { repoUrl }),
+  getRepoFilesPage: (repoUrl, { cursor = null, limit = 500, prefix = '' } = {}) =>
+    apiClient.post('/repo/files/page', { repoUrl, cursor, limit, prefix }),
   getFrameworks: (repoUrl) => apiClient.post('/repo/frameworks', { repoUrl }),
   
   // AI Generation
-  generateSummaries: (repoUrl, filePaths, framework = 'jest') => 
-    apiClient.post('/generate/summaries', { repoUrl, filePaths, framework }),
-  generateCode: (fileContents, summary, framework = 'jest') => 
-    apiClient.post('/generate/code', { fileContents, summary, framework }),
+  generateSummaries: (repoUrl, filePaths, framework = 'jest', fileShas = {}) => 
+    apiClient.post('/generate/summaries', { repoUrl, filePaths, framework, fileShas }),
+  // request: { summary, framework, repoUrl, filePaths, fileShas } (or fileContents instead of repo fields)
+  generateCode: (request) => 
+    apiClient.post('/generate/code', request),
+  // Streams code chunks to onChunk; onDone receives the cleaned code (markdown fences removed)
+  // when it differs from the streamed text. Abort via signal to cancel the generation
+  generateCodeStream: async (request, { onChunk, onDone, signal } = {}) => {
+    const token = localStorage.getItem('github_token');
+    const headers = { 'Content-Type': 'application/json' };
+    if (token && token !== 'personal') {
+      headers.Authorization = `Bearer ${token}`;
+    }
+
+    const response = await fetch(`${API_BASE_URL}/generate/code/stream`, {
+      method: 'POST',
+      headers,
+      body: JSON.stringify(request),
+      signal,
+    });
+    if (!response.ok) {
+      throw new Error(`Code generation failed with status ${response.status}`);
+    }
+
+    await readEventStream(response, (event, data) => {
+      if (event === 'error') throw new Error(data.detail || 'Code generation failed');
+      if (event === 'message' && data.text) onChunk?.(data.text);
+      if (event === 'done' && data.code) onDone?.(data.code);
+    });
+  },
 };
 
 export default api;
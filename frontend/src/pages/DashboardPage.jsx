@@ -1,4 +1,4 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import { useNavigate, useLocation } from 'react-router-dom';
 import { 
   LogOut, 
@@ -22,18 +22,21 @@ function DashboardPage() {
   const [repos, setRepos] = useState([]);
   const [selectedRepo, setSelectedRepo] = useState(null);
   const [files, setFiles] = useState([]);
+  const [filesCursor, setFilesCursor] = useState(null);
   const [selectedFiles, setSelectedFiles] = useState([]);
   const [frameworks, setFrameworks] = useState([]);
   const [selectedFramework, setSelectedFramework] = useState('');
   const [summaries, setSummaries] = useState([]);
   const [activeSummary, setActiveSummary] = useState(null);
   const [generatedCode, setGeneratedCode] = useState('');
+  const codeStreamRef = useRef(null);
   
   // Loading states
   const [loading, setLoading] = useState({
     user: true,
     repos: false,
     files: false,
+    moreFiles: false,
     frameworks: false,
     summaries: false,
     code: false
@@ -99,10 +102,11 @@ function DashboardPage() {
     try {
       setLoading(prev => ({ ...prev, files: true, frameworks: true }));
       const [filesResponse, frameworksResponse] = await Promise.all([
-        api.getRepoFiles(repoUrl),
+        api.getRepoFilesPage(repoUrl),
         api.getFrameworks(repoUrl)
       ]);
-      setFiles(filesResponse.data);
+      setFiles(filesResponse.data.files);
+      setFilesCursor(filesResponse.data.nextCursor);
       setFrameworks(frameworksResponse.data.frameworks || []);
       setSelectedFramework(frameworksResponse.data.frameworks?.[0]?.name || '');
       setSelectedFiles([]);
@@ -116,6 +120,22 @@ function DashboardPage() {
     }
   };
 
+  // Fetch the next page of files for the selected repository
+  const loadMoreFiles = async () => {
+    if (!selectedRepo || !filesCursor) return;
+    
+    try {
+      setLoading(prev => ({ ...prev, moreFiles: true }));
+      const response = await api.getRepoFilesPage(selectedRepo.html_url, { cursor: filesCursor });
+      setFiles(prev => [...prev, ...response.data.files]);
+      setFilesCursor(response.data.nextCursor);
+    } catch (error) {
+      console.error('Error fetching more files:', error);
+    } finally {
+      setLoading(prev => ({ ...prev, moreFiles: false }));
+    }
+  };
+
   // Handle repository selection
   const handleRepoSelect = (repo) => {
     setSelectedRepo(repo);
@@ -131,6 +151,11 @@ function DashboardPage() {
     );
   };
 
+  // Blob SHAs of the selected files, so the backend can fetch (and cache) contents by SHA
+  const selectedFileShas = () => Object.fromEntries(
+    files.filter(f => selectedFiles.includes(f.path) && f.sha).map(f => [f.path, f.sha])
+  );
+
   // Generate summaries
   const generateSummaries = async () => {
     if (!selectedRepo || selectedFiles.length === 0) return;
@@ -138,7 +163,7 @@ function DashboardPage() {
     try {
       setLoading(prev => ({ ...prev, summaries: true }));
       const framework = selectedFramework || 'jest'; // Default to Jest if no framework selected
-      const response = await api.generateSummaries(selectedRepo.html_url, selectedFiles, framework);
+      const response = await api.generateSummaries(selectedRepo.html_url, selectedFiles, framework, selectedFileShas());
       setSummaries(response.data.summaries || []);
       setActiveSummary(null);
       setGeneratedCode('');
@@ -154,27 +179,55 @@ function DashboardPage() {
   const generateCode = async () => {
     if (!selectedRepo || !activeSummary) return;
     
+    // Starting a new stream cancels the previous one
+    codeStreamRef.current?.abort();
+    const controller = new AbortController();
+    codeStreamRef.current = controller;
+    
     try {
       setLoading(prev => ({ ...prev, code: true }));
       
-      // Get file contents for the selected files
-      let fileContents = '';
-      for (const filePath of selectedFiles) {
-        // This is a simplified approach - in a real app, you'd fetch the actual content
-        fileContents += `// File: ${filePath}\n// Content would be fetched here\n\n`;
-      }
-      
       const framework = selectedFramework || 'jest'; // Default to Jest if no framework selected
-      const response = await api.generateCode(fileContents, activeSummary, framework);
-      setGeneratedCode(response.data.code || '');
+      
+      // The backend resolves file contents from the repository (reusing its cache)
+      const request = {
+        summary: activeSummary,
+        framework,
+        repoUrl: selectedRepo.html_url,
+        filePaths: selectedFiles,
+        fileShas: selectedFileShas(),
+      };
+      
+      // Stream the code in as it is generated
+      setGeneratedCode('');
+      await api.generateCodeStream(request, {
+        onChunk: (text) => setGeneratedCode(prev => prev + text),
+        onDone: (code) => setGeneratedCode(code),
+        signal: controller.signal,
+      });
     } catch (error) {
+      if (error.name === 'AbortError') return;
       console.error('Error generating code:', error);
       setGeneratedCode('Error generating code. Please try again.');
     } finally {
-      setLoading(prev => ({ ...prev, code: false }));
+      // An aborted stream finishes after its replacement started; leave the loading state to that one
+      if (codeStreamRef.current === controller) {
+        codeStreamRef.current = null;
+        setLoading(prev => ({ ...prev, code: false }));
+      }
     }
   };
 
+  // Cancel an in-flight generation (server stops when the client disconnects)
+  const cancelCodeGeneration = () => {
+    codeStreamRef.current?.abort();
+    codeStreamRef.current = null;
+    setGeneratedCode('');
+    setLoading(prev => ({ ...prev, code: false }));
+  };
+
+  useEffect(() => () => codeStreamRef.current?.abort(), []);
+
   // Logout
   const handleLogout = () => {
     localStorage.removeItem('github_token');
@@ -294,6 +347,16 @@ function DashboardPage() {
                           </span>
                         </label>
                       ))}
+                      {filesCursor && (
+                        <button
+                          onClick={loadMoreFiles}
+                          disabled={loading.moreFiles}
+                          className="w-full flex items-center justify-center space-x-2 p-2 mt-1 text-sm text-blue-400 hover:bg-dark-700 rounded disabled:cursor-not-allowed"
+                        >
+                          {loading.moreFiles && <Loader2 className="w-4 h-4 animate-spin" />}
+                          <span>Load more files</span>
+                        </button>
+                      )}
                     </div>
                   )}
                 </div>
@@ -384,7 +447,7 @@ function DashboardPage() {
               {generatedCode && (
                 <CodeDisplay
                   code={generatedCode}
-                  onBack={() => setGeneratedCode('')}
+                  onBack={cancelCodeGeneration}
                 />
               )}
             </div>